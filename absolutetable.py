@@ -5,6 +5,7 @@ import pandas as pd
 import panel as pn
 
 from experimentdata import ExperimentData
+from problemtable import gradient_styles
 from table import Tablereport
 
 class AbsoluteTablereport(Tablereport):
@@ -38,47 +39,30 @@ class AbsoluteTablereport(Tablereport):
 
     def set_experiment_data_dependent_parameters(self):
         param_updates = super().set_experiment_data_dependent_parameters()
-        self.param.algorithms.objects = self.experiment_data.algorithms
+        self.param.algorithms.objects = self.algorithm_options()
         self.param.algorithms.default = self.experiment_data.algorithms
         param_updates["algorithms"] = self.experiment_data.algorithms
         return param_updates
 
-    def update_algorithm_names(self, mapping):
-        super().update_algorithm_names(mapping)
-        self.param.algorithms.objects = self.experiment_data.algorithms
-        self.algorithms = [mapping[x] for x in self.algorithms]
+    def update_algorithm_names(self):
+        super().update_algorithm_names()
+        self.param.algorithms.objects = self.algorithm_options()
 
 
     def get_view_table(self):
-        return self.table[["Index"] + self.algorithms]
+        return self.get_visible_table()[["Index"] + self.algorithms]
 
 
     def get_current_columns(self):
         return self.algorithms
 
 
-    def style_table_by_row(self, row):
-        style = super().style_table_by_row(row)
-        attribute = row.name[0]
-        min_wins = self.experiment_data.attribute_info[attribute].min_wins
+    def get_style_key(self):
+        return tuple(self.algorithms)
 
-        if min_wins is None:
-            return style
 
-        numeric_values = pd.to_numeric(row,errors='coerce')
-        min_val = numeric_values.dropna().min()
-        max_val = numeric_values.dropna().max()
-        if min_val == max_val:
-            return style
-        for i, val in enumerate(numeric_values):
-            if not pd.isnull(val):
-                percentage = (val - min_val) / (max_val-min_val)
-                if min_wins:
-                  percentage = 1-percentage
-                green = (percentage*175).astype(int)
-                blue = ((1-percentage)*255).astype(int)
-                style[i] = style[i]+ "color: #00{:02x}{:02x};".format(green, blue)
-        return style
+    def compute_value_styles(self, attribute, values, min_wins):
+        return gradient_styles(values, min_wins)
 
 
     def get_params_as_dict(self):
@@ -93,5 +77,7 @@ class AbsoluteTablereport(Tablereport):
     def set_params_from_dict(self, params):
         super().set_params_from_dict(params)
         if "algorithms" in params:
-            params["algorithms"] = [self.param.algorithms.objects[x] for x in params["algorithms"]]
+            # objects maps display names to algorithms, only the algorithms can be indexed
+            algorithms = list(self.param.algorithms.objects)
+            params["algorithms"] = [algorithms[x] for x in params["algorithms"]]
         self.param.update(params) #TODO: currently we need to make sure that the child calls this, maybe redesign...
@@ -0,0 +1,173 @@
+import numpy as np
+
+AGGREGATORS = ["sum", "mean", "gmean"]
+# gmean is undefined for 0, so we replace 0 with this value before aggregating.
+GMEAN_ZERO_REPLACEMENT = 0.000001
+# Number of attributes that are processed together when computing partials from scratch.
+ATTRIBUTE_CHUNK_SIZE = 8
+
+
+# Returns the contributions of values to sums, log sums and invalid (negative)
+# log counts. Missing values contribute nothing.
+def contributions(values):
+    missing = np.isnan(values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logs = np.log(np.where(values == 0, GMEAN_ZERO_REPLACEMENT, values))
+    invalid = ~missing & np.isnan(logs)
+    return np.where(missing, 0.0, values), np.where(missing | invalid, 0.0, logs), invalid.astype(np.int64)
+
+
+def combine(sums, log_sums, invalid, counts):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "sum": sums.copy(),
+            "mean": np.where(counts > 0, sums / counts, np.nan),
+            "gmean": np.where((counts > 0) & (invalid == 0), np.exp(log_sums / counts), np.nan),
+        }
+
+
+# Per attribute, domain and algorithm: the sum, the sum of logarithms and the
+# number of problems where all selected algorithms have a value. Sums, means
+# and geometric means over the selected domains are derived from these
+# partials and kept as running totals.
+#
+# Selecting or deselecting a few algorithms only touches the problems whose
+# "all selected algorithms have a value" status changes (tracked with the
+# number of missing values per problem), and selecting or deselecting a
+# domain adds or subtracts that domain's partials from the totals. The
+# partials are computed for all algorithms, results for algorithms that are
+# not selected are meaningless.
+#
+# Subtracting a non-finite contribution (e.g. an infinite value) cannot
+# restore the previous sum, so partials and totals that are not finite after
+# removing contributions are recomputed from scratch.
+class DomainPartials():
+    def __init__(self, store, attributes, algorithm_positions, domain_mask):
+        self.store = store
+        self.attributes = attributes
+        num_problems = len(store.problem_index)
+        domain_sizes = np.diff(np.append(store.domain_offsets, num_problems))
+        self.problem_domains = np.repeat(np.arange(len(store.domain_offsets)), domain_sizes)
+        self.selected_algorithms = np.zeros(len(store.algorithms), dtype=bool)
+        self.selected_algorithms[algorithm_positions] = True
+        self.selected_domains = np.asarray(domain_mask, dtype=bool)
+        self.recompute()
+
+
+    def recompute(self):
+        num_attributes = len(self.attributes)
+        num_problems = len(self.problem_domains)
+        num_domains = len(self.selected_domains)
+        num_algorithms = len(self.selected_algorithms)
+        self.missing = np.zeros((num_attributes, num_problems), dtype=np.int64)
+        self.sums = np.zeros((num_attributes, num_domains, num_algorithms))
+        self.log_sums = np.zeros((num_attributes, num_domains, num_algorithms))
+        self.invalid = np.zeros((num_attributes, num_domains, num_algorithms), dtype=np.int64)
+        self.counts = np.zeros((num_attributes, num_domains), dtype=np.int64)
+        self.compute_partials(np.arange(num_attributes))
+        self.recompute_totals()
+
+
+    # Computes the partials of the attributes with the given indices from scratch.
+    def compute_partials(self, indices):
+        if len(self.problem_domains) == 0:
+            return
+        offsets = self.store.domain_offsets
+        all_positions = np.arange(len(self.selected_algorithms))
+        for start in range(0, len(indices), ATTRIBUTE_CHUNK_SIZE):
+            chunk = indices[start:start + ATTRIBUTE_CHUNK_SIZE]
+            values = self.store.numeric_values([self.attributes[i] for i in chunk], all_positions)
+            self.missing[chunk] = np.isnan(values[:, :, self.selected_algorithms]).sum(axis=2)
+            complete = (self.missing[chunk] == 0)[:, :, np.newaxis]
+            for target, contribution in zip([self.sums, self.log_sums, self.invalid], contributions(values)):
+                target[chunk] = np.add.reduceat(np.where(complete, contribution, 0), offsets, axis=1)
+            self.counts[chunk] = np.add.reduceat(complete[:, :, 0].astype(np.int64), offsets, axis=1)
+
+
+    def recompute_totals(self):
+        self.total_sums = self.sums[:, self.selected_domains].sum(axis=1)
+        self.total_log_sums = self.log_sums[:, self.selected_domains].sum(axis=1)
+        self.total_invalid = self.invalid[:, self.selected_domains].sum(axis=1)
+        self.total_counts = self.counts[:, self.selected_domains].sum(axis=1)
+
+
+    def set_algorithms(self, algorithm_positions):
+        selected = np.zeros(len(self.selected_algorithms), dtype=bool)
+        selected[algorithm_positions] = True
+        toggled = np.flatnonzero(selected != self.selected_algorithms)
+        if len(toggled) == 0:
+            return
+        self.selected_algorithms = selected
+        # Many changes at once are cheaper to compute from scratch.
+        if len(toggled) > max(1, len(selected) // 4):
+            self.recompute()
+            return
+
+        signs = np.where(selected[toggled], 1, -1)
+        inexact = []
+        for i, attribute in enumerate(self.attributes):
+            missing = self.missing[i] + (np.isnan(self.store.columns[attribute][:, toggled]) * signs).sum(axis=1)
+            self.update_problems(i, np.flatnonzero((self.missing[i] > 0) & (missing == 0)), 1)
+            if not self.update_problems(i, np.flatnonzero((self.missing[i] == 0) & (missing > 0)), -1):
+                inexact.append(i)
+            self.missing[i] = missing
+        if inexact:
+            self.compute_partials(np.array(inexact))
+            self.recompute_totals()
+
+
+    # Adds (sign=1) or removes (sign=-1) the given problems of attribute i
+    # to/from the partials. Returns False if removing left non-finite
+    # partials or totals, which then have to be recomputed.
+    def update_problems(self, i, problems, sign):
+        if len(problems) == 0:
+            return True
+        domains = self.problem_domains[problems]
+        in_selected_domain = self.selected_domains[domains]
+        values = self.store.columns[self.attributes[i]][problems]
+        for target, total, contribution in zip([self.sums, self.log_sums, self.invalid],
+                                               [self.total_sums, self.total_log_sums, self.total_invalid],
+                                               contributions(values)):
+            # inf - inf is NaN here, the partials are recomputed in that case.
+            with np.errstate(invalid="ignore"):
+                np.add.at(target[i], domains, sign * contribution)
+                total[i] += sign * contribution[in_selected_domain].sum(axis=0)
+        np.add.at(self.counts[i], domains, sign)
+        self.total_counts[i] += sign * np.count_nonzero(in_selected_domain)
+        return sign > 0 or all(np.isfinite(x).all() for x in [self.sums[i][domains], self.log_sums[i][domains],
+                                                              self.total_sums[i], self.total_log_sums[i]])
+
+
+    def set_domains(self, domain_mask):
+        domain_mask = np.asarray(domain_mask, dtype=bool)
+        toggled = np.flatnonzero(domain_mask != self.selected_domains)
+        self.selected_domains = domain_mask
+        if len(toggled) > max(1, len(domain_mask) // 2):
+            self.recompute_totals()
+            return
+        signs = np.where(domain_mask[toggled], 1, -1)
+        with np.errstate(invalid="ignore"):
+            self.total_sums += (self.sums[:, toggled] * signs[:, np.newaxis]).sum(axis=1)
+            self.total_log_sums += (self.log_sums[:, toggled] * signs[:, np.newaxis]).sum(axis=1)
+        self.total_invalid += (self.invalid[:, toggled] * signs[:, np.newaxis]).sum(axis=1)
+        self.total_counts += (self.counts[:, toggled] * signs).sum(axis=1)
+        if (signs < 0).any() and not (np.isfinite(self.total_sums).all() and np.isfinite(self.total_log_sums).all()):
+            self.recompute_totals()
+
+
+    # Returns {aggregator: (attributes x algorithms)} over the selected domains
+    # and the number of aggregated problems per attribute. Attributes without
+    # any complete problem in any domain are NaN.
+    def aggregate(self):
+        aggregates = combine(self.total_sums, self.total_log_sums, self.total_invalid, self.total_counts[:, np.newaxis])
+        aggregates["sum"][self.counts.sum(axis=1) == 0] = np.nan
+        return aggregates, self.total_counts
+
+
+    # Returns {aggregator: (attributes x domains x algorithms)} and the number
+    # of aggregated problems per attribute and domain. Domains without any
+    # complete problem are NaN.
+    def aggregate_domains(self):
+        aggregates = combine(self.sums, self.log_sums, self.invalid, self.counts[:, :, np.newaxis])
+        aggregates["sum"][self.counts == 0] = np.nan
+        return aggregates, self.counts
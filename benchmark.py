@@ -0,0 +1,145 @@
+#! /usr/bin/env python3
+
+# Compares the legacy pandas-based properties parsing with the streaming
+# loader on synthetic properties files. Every measurement runs in a fresh
+# subprocess so that peak RSS values are not influenced by earlier runs.
+#
+#   ./benchmark.py --runs 10000 100000 1000000 --directory /tmp/bench
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+# Ordered such that few attributes still cover ipc scores and the usual aggregators.
+NUMERIC_ATTRIBUTES = ["coverage", "cost", "expansions", "total_time", "memory",
+                      "search_time", "generated", "plan_length", "evaluations"]
+PROBLEMS_PER_DOMAIN = 50
+
+
+# Returns the first num_attributes of NUMERIC_ATTRIBUTES, followed by
+# generic attributes if more are requested.
+def attribute_names(num_attributes):
+    names = NUMERIC_ATTRIBUTES[:num_attributes]
+    return names + [f"attribute{i:03d}" for i in range(num_attributes - len(names))]
+
+
+# Algorithms come as base and v1 variant of a configuration, such that
+# scatter plot wildcard entries can pair them.
+def algorithm_names(num_algorithms):
+    return [f"config{i // 2:03d}-{'v1' if i % 2 else 'base'}" for i in range(num_algorithms)]
+
+
+# Writes a lab-like properties file with num_runs runs, one per
+# (algorithm, domain, problem) combination, with problems_per_domain
+# problems per domain and num_attributes numeric attributes. Unsolved runs
+# have no cost, plan length, expansions and search time, but an error.
+# Every other value except coverage is missing with probability missing.
+def write_synthetic_properties(path, num_runs, num_algorithms=10, seed=0, problems_per_domain=PROBLEMS_PER_DOMAIN,
+                               num_attributes=len(NUMERIC_ATTRIBUTES), missing=0):
+    rng = random.Random(seed)
+    algorithms = algorithm_names(num_algorithms)
+    attributes = attribute_names(num_attributes)
+    num_tasks = max(1, num_runs // num_algorithms)
+    with open(path, "w") as f:
+        f.write("{\n")
+        for i in range(num_runs):
+            algorithm = algorithms[i % num_algorithms]
+            task = i // num_algorithms % num_tasks
+            domain = f"domain{task // problems_per_domain:04d}"
+            problem = f"p{task % problems_per_domain:04d}.pddl"
+            solved = rng.random() < 0.7
+            values = {"coverage": int(solved)}
+            values["memory"] = rng.randint(10000, 2000000)
+            values["total_time"] = rng.uniform(0.1, 1800)
+            error = None
+            if solved:
+                values["cost"] = rng.randint(1, 200)
+                values["plan_length"] = values["cost"]
+                values["expansions"] = rng.randint(1, 10**7)
+                values["evaluations"] = values["generated"] = values["expansions"] * 3
+                values["search_time"] = rng.uniform(0.01, values["total_time"])
+            else:
+                error = rng.choice(["search-out-of-time", "search-out-of-memory"])
+            for attribute in attributes[len(NUMERIC_ATTRIBUTES):]:
+                values[attribute] = rng.lognormvariate(5, 3)
+            run = {"algorithm": algorithm, "domain": domain, "problem": problem}
+            for attribute in attributes:
+                if attribute in values and (attribute == "coverage" or not missing or rng.random() >= missing):
+                    run[attribute] = values[attribute]
+            if error:
+                run["error"] = error
+            f.write(f"{json.dumps(f'{algorithm}-{domain}-{problem}')}: {json.dumps(run)}")
+            f.write(",\n" if i < num_runs - 1 else "\n")
+        f.write("}\n")
+
+
+# The parsing steps ExperimentData used before the streaming loader.
+def load_legacy(path):
+    import pandas as pd
+    data = pd.read_json(path, orient="index")
+    attributes = [x for x in data.columns if x not in ["algorithm", "domain", "problem"]]
+    data = data.pivot(index=["domain","problem"], columns="algorithm", values=attributes).stack(0, dropna = False)
+    data.index.names = ["domain","problem","attribute"]
+    return data.reorder_levels(["attribute","domain","problem"]).sort_index()
+
+
+def load_streaming(path):
+    from propertiesloader import load_properties
+    return load_properties(path).to_frame()
+
+
+LOADERS = {"legacy": load_legacy, "streaming": load_streaming}
+
+
+def measure(loader, path):
+    import pandas # imported before measuring so that it does not count towards the load
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    frame = LOADERS[loader](path)
+    seconds = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "loader": loader,
+        "seconds": seconds,
+        "peak_rss_mb": rss_after / 1024,
+        "peak_rss_increase_mb": (rss_after - rss_before) / 1024,
+        "rows": len(frame.index),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--loaders", nargs="+", choices=LOADERS.keys(), default=list(LOADERS.keys()))
+    parser.add_argument("--directory", default=".")
+    parser.add_argument("--measure", nargs=2, metavar=("LOADER", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(*args.measure)))
+        return
+
+    results = []
+    for num_runs in args.runs:
+        path = os.path.join(args.directory, f"properties-{num_runs}.json")
+        if not os.path.exists(path):
+            write_synthetic_properties(path, num_runs)
+        for loader in args.loaders:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", loader, os.path.abspath(path)],
+                                    capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)))
+            result = json.loads(output.stdout) | {"runs": num_runs, "file_size_mb": os.path.getsize(path) / 2**20}
+            results.append(result)
+            print(f"{num_runs:>8} runs  {loader:<10} {result['seconds']:8.2f}s  "
+                  f"peak RSS {result['peak_rss_mb']:8.1f} MB (+{result['peak_rss_increase_mb']:.1f} MB)",
+                  file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
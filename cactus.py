@@ -1,5 +1,5 @@
 from bokeh.plotting import figure
-from bokeh.models import HoverTool, TapTool, Legend, LegendItem, Span
+from bokeh.models import ColumnDataSource, HoverTool, TapTool, Legend, LegendItem, Span
 import math
 import numpy as np
 import param
@@ -17,6 +17,42 @@ COLORS = ["black", "red", "blue", "teal", "orange",
           "purple", "olive", "lime", "cyan"]
 
 
+# Returns the cactus curve (sorted values, coverage) of every column of
+# values (tasks x algorithms) and the number of covered tasks per column.
+# Missing values are not covered, 0 is replaced by replace_zero and values
+# <= 0 are dropped from the curves if drop_nonpositive is set.
+def cactus_curves(values, replace_zero, drop_nonpositive):
+    values = np.sort(values, axis=0) # missing values are sorted last
+    counts = np.count_nonzero(~np.isnan(values), axis=0)
+    values = np.where(values == 0, replace_zero, values)
+    coverage = np.arange(1, len(values) + 1)
+    curves = []
+    for j, count in enumerate(counts):
+        x, y = values[:count, j], coverage[:count]
+        if drop_nonpositive:
+            keep = ~(x <= 0)
+            x, y = x[keep], y[keep]
+        curves.append((x, y))
+    return curves, counts
+
+
+# Reduces a step curve to at most max_steps points (all points if max_steps
+# is 0). Points with the same x are merged into the last one, which does not
+# change the drawn steps. If that is not enough, only every k-th point and
+# the last point are kept, such that the drawn coverage is off by less than
+# k anywhere.
+def downsample_steps(x, y, max_steps):
+    if max_steps <= 0 or len(x) <= max_steps:
+        return x, y
+    last = np.append(x[1:] != x[:-1], True)
+    x, y = x[last], y[last]
+    if len(x) > max_steps:
+        stride = math.ceil(len(x) / max_steps)
+        keep = np.unique(np.append(np.arange(stride - 1, len(x), stride), len(x) - 1))
+        x, y = x[keep], y[keep]
+    return x, y
+
+
 class Cactusplot(Report):
     attribute = param.Selector(default="--")
     algorithms = param.ListSelector()
@@ -31,6 +67,8 @@ class Cactusplot(Report):
     y_size = param.Integer(default = 500)
     colors = param.List(default=COLORS)
     line_width = param.Integer(default = 2, bounds=(1,10))
+    max_steps = param.Integer(default = 10000, bounds = (0, None),
+        doc = "Curves with more steps are downsampled to this many steps, 0 draws all steps.")
 
 
     def __init__(self, experiment_data = ExperimentData(), param_dict = dict(), **params):
@@ -51,6 +89,7 @@ class Cactusplot(Report):
             pn.Param(self.param.y_size),
             pn.Param(self.param.colors),
             pn.Param(self.param.line_width),
+            pn.Param(self.param.max_steps),
             pn.pane.Markdown("""
                 ### Information
                 TODO
@@ -66,15 +105,15 @@ class Cactusplot(Report):
         param_updates = super().set_experiment_data_dependent_parameters()
         self.param.attribute.objects = ["--", *self.experiment_data.numeric_attributes]
         param_updates["attribute"] = "--"
-        self.param.algorithms.objects = self.experiment_data.algorithms
+        self.param.algorithms.objects = self.algorithm_options()
         self.param.algorithms.default = self.experiment_data.algorithms
         param_updates["algorithms"] = self.experiment_data.algorithms
         return param_updates
 
 
-    def update_algorithm_names(self, mapping):
-        self.param.algorithms.objects = self.experiment_data.algorithms
-        self.algorithms = [mapping[x] for x in self.algorithms]
+    def update_algorithm_names(self):
+        super().update_algorithm_names()
+        self.param.algorithms.objects = self.algorithm_options()
 
 
     @param.depends('autoscale', watch=True)
@@ -92,24 +131,11 @@ class Cactusplot(Report):
 
         self.data_view_in_progress = True
 
-        # Build the DataFrame used in the plot.
-        frames = []
-        max_values = {}
-        for alg in self.algorithms:
-            xcol = np.sort(self.experiment_data.data.loc[self.attribute][alg].dropna())
-            max_values[alg] = len(xcol)
-            ycol = np.array(range(1,len(xcol)+1))
-            new_frame = pd.DataFrame({'x':xcol, 'y':ycol, 'name':alg})
-            frames.append(new_frame)
-        overall_frame = pd.concat(frames)
-        overall_frame.replace(0, self.replace_zero, inplace=True)
-
-        if self.x_scale == "log":
-            overall_frame = overall_frame[~(overall_frame['x'] <= 0)]
-        if self.y_scale == "log":
-            overall_frame = overall_frame[~(overall_frame['y'] <= 0)]
-
-        if overall_frame.empty or pd.isnull(overall_frame['x']).all() or pd.isnull(overall_frame['y']).all():
+        # Build the curves of all algorithms at once.
+        values = self.experiment_data.views.numeric_block(self.attribute, self.algorithms)
+        curves, counts = cactus_curves(values, self.replace_zero, self.x_scale == "log")
+
+        if all(len(x) == 0 for x, _ in curves):
             self.data_view = pn.pane.Markdown("All points have been dropped")
             self.data_view_in_progress = False
             return
@@ -119,14 +145,18 @@ class Cactusplot(Report):
         ylabel = "coverage"
 
         # Compute min and max values.
-        xmax = overall_frame['x'].max()
-        xmin = overall_frame['x'].min()
-        ymax = overall_frame['y'].max()
-        ymin = overall_frame['y'].min()
-
-        for alg in self.algorithms:
-            overall_frame.loc[len(overall_frame)] = [xmax, max_values[alg], alg]
-        overall_frame.set_index("name", inplace=True)
+        xmax = max(x[-1] for x, _ in curves if len(x))
+        xmin = min(x[0] for x, _ in curves if len(x))
+        ymax = max(y[-1] for _, y in curves if len(y))
+        ymin = min(y[0] for _, y in curves if len(y))
+
+        # Downsample the curves and extend them to xmax with their final coverage.
+        # The algorithm column is only used by the tooltip.
+        sources = []
+        for alg, (x, y), count in zip(self.algorithms, curves, counts):
+            x, y = downsample_steps(x, y, self.max_steps)
+            sources.append(ColumnDataSource({'x': np.append(x, xmax), 'y': np.append(y, count).astype(np.int32),
+                                             'algorithm': np.full(len(x) + 1, self.display_names[alg], dtype=object)}))
 
         # Compute ranges if they are not specified.
         if self.autoscale:
@@ -135,7 +165,7 @@ class Cactusplot(Report):
               "y_range" : (ymin*0.9, ymax*1.1)
             })
 
-        indices = self.algorithms
+        indices = [self.display_names[alg] for alg in self.algorithms]
 
         # compute appropriate number of columns and height of legend
         indices_length = [len(i) for i in indices]
@@ -159,13 +189,19 @@ class Cactusplot(Report):
 
 
         legend_items = []
+        hover_lines = []
         for i, index in enumerate(indices):
-            df = overall_frame.loc[[index]].reset_index()
-            p = plot.step(x='x', y='y', source=df, line_width=self.line_width,
+            p = plot.step(x='x', y='y', source=sources[i], line_width=self.line_width,
                 line_color=self.colors[i%len(COLORS)], mode="after")
             # the line plot is invisible but allows for hover (step does not offer support for hover: https://github.com/bokeh/bokeh/wiki/Glyph-Hit-Testing-Census)
-            p = plot.line(x='x', y='y', source=df, line_alpha=0)
-            legend_items.append(LegendItem(label=index, renderers = [plot.renderers[2*i]]))
+            hover_lines.append(plot.line(x='x', y='y', source=sources[i], line_alpha=0))
+            legend_items.append(LegendItem(label=index, renderers = [p]))
+        # one hover tool for all curves
+        plot.add_tools(HoverTool(renderers=hover_lines, tooltips=[
+            (self.attribute, '@x'),
+            ('coverage', '@y'),
+            ('algorithm', '@algorithm'),
+            ]))
 
 
         # legend
@@ -174,14 +210,6 @@ class Cactusplot(Report):
         plot.add_layout(legend, 'below')
         plot.legend.ncols = ncols
 
-
-        # hover info
-        plot.add_tools(HoverTool(tooltips=[
-            (self.attribute, '@x'),
-            ('coverage', '@y'),
-            ('algorithm', '@name'),
-            ]))
-
         self.data_view = pn.Column(plot, sizing_mode="fixed", scroll=True)
         self.data_view_in_progress = False
 
@@ -197,6 +225,8 @@ class Cactusplot(Report):
 
 
     def set_params_from_dict(self, params):
+        if "algorithms" in params:
+            params["algorithms"] = self.algorithms_from_names(params["algorithms"])
         if "x_range" in params:
             params["x_range"] = tuple(params["x_range"])
         if "y_range" in params:
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Default upper bound on the bytes held by one DerivedViews cache.
+DERIVED_VIEW_CACHE_SIZE = 128 * 2**20
+
+
+# Returns the (shallow, objects in object columns are not counted) size of a view in bytes.
+def view_size(view):
+    if isinstance(view, np.ndarray):
+        return view.nbytes
+    if isinstance(view, pd.DataFrame):
+        return int(view.memory_usage(index=True, deep=False).sum())
+    return 0
+
+
+# Memoizes views derived from an AttributeStore that several reports need,
+# such that switching between reports reuses what was already computed.
+# Views are keyed by (kind, attribute, ...), where attribute is None for
+# views that depend on all attributes. The least recently used views are
+# evicted once the cache holds more than max_size bytes. Views are shared
+# between reports and must not be modified, callers copy them if needed.
+class DerivedViews():
+    def __init__(self, store, max_size=DERIVED_VIEW_CACHE_SIZE):
+        self.store = store
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # key -> (view, size)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+
+    # Returns the view under key, computing it with compute() if it is not cached.
+    def get(self, key, compute):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+
+        view = compute()
+
+        with self.lock:
+            if key in self.entries:
+                return view
+            size = view_size(view)
+            self.entries[key] = (view, size)
+            self.size += size
+            while self.size > self.max_size and len(self.entries) > 1:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+            return view
+
+
+    # Returns the read-only (problems x algorithms) values of an attribute.
+    def numeric_block(self, attribute, algorithms):
+        def compute():
+            positions = [self.store.algorithms.index(a) for a in algorithms]
+            block = self.store.columns[attribute][:, positions]
+            block.flags.writeable = False
+            return block
+        return self.get(("numeric_block", attribute, tuple(algorithms)), compute)
+
+
+    # Returns the frame with one row per attribute holding the values of one problem.
+    def problem_slice(self, domain, problem):
+        return self.get(("problem_slice", None, domain, problem),
+                        lambda: self.store.problem_frame(domain, problem))
+
+
+    # Drops the views of the given attributes, or all views if attributes is None.
+    def invalidate(self, attributes=None):
+        with self.lock:
+            if attributes is None:
+                self.entries.clear()
+                self.size = 0
+                return
+            attributes = set(attributes)
+            for key in [k for k in self.entries if k[1] in attributes]:
+                _, size = self.entries.pop(key)
+                self.size -= size
+
+
+    def __str__(self):
+        return f"{len(self.entries)} derived views ({self.size / 2**20:.1f} MiB), {self.hits} hits, {self.misses} misses"
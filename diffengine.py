@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+
+# Returns the (rows x algorithms) block of others-base, or (others/base)-1
+# if percentual is set, for a base column and an others block.
+def diff_values(base, others, percentual):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (others / base)-1 if percentual else others - base
+
+
+# Computes Diff columns of algorithms against a baseline algorithm on the
+# values of a table. The numeric columns and Diff vectors are memoized until
+# the table (or its version, which changes whenever values are rewritten)
+# changes. Diffs of several algorithms against the same baseline are
+# computed as one block.
+class DiffEngine():
+    def __init__(self):
+        self.table = None
+        self.version = None
+        self.numeric_columns = dict() # algorithm -> float column
+        self.diffs = dict() # (baseline, algorithm, percentual) -> Diff column
+
+
+    def set_table(self, table, version):
+        if table is self.table and version == self.version:
+            return
+        self.table = table
+        self.version = version
+        self.numeric_columns = dict()
+        self.diffs = dict()
+
+
+    def numeric_column(self, algorithm):
+        if algorithm not in self.numeric_columns:
+            self.numeric_columns[algorithm] = pd.to_numeric(self.table[algorithm], errors="coerce").to_numpy(dtype=float)
+        return self.numeric_columns[algorithm]
+
+
+    # Returns the (rows x algorithms) block of algorithm-baseline, or
+    # (algorithm/baseline)-1 if percentual is set.
+    def diff_block(self, baseline, algorithms, percentual):
+        missing = [a for a in algorithms if (baseline, a, percentual) not in self.diffs]
+        if missing:
+            base = self.numeric_column(baseline)[:, np.newaxis]
+            others = np.column_stack([self.numeric_column(a) for a in missing])
+            block = diff_values(base, others, percentual)
+            for j, algorithm in enumerate(missing):
+                self.diffs[(baseline, algorithm, percentual)] = block[:, j]
+        return np.column_stack([self.diffs[(baseline, a, percentual)] for a in algorithms])
@@ -4,6 +4,7 @@ import param
 import pandas as pd
 import panel as pn
 
+from diffengine import DiffEngine, diff_values
 from experimentdata import ExperimentData
 from table import Tablereport
 
@@ -11,9 +12,12 @@ class DiffTablereport(Tablereport):
     algorithm1 = param.Selector(default="--")
     algorithm2 = param.Selector(default="--")
     percentual = param.Boolean(default=False)
+    variants = param.ListSelector(default=[])
 
 
     def __init__(self, experiment_data = ExperimentData(), param_dict = dict(), **params):
+        self.diff_engine = DiffEngine()
+        self.view_table = (None, pd.DataFrame()) # (key, table) of the last view table
         super().__init__(experiment_data, **params)
 
         self.param_view.extend([
@@ -23,6 +27,8 @@ class DiffTablereport(Tablereport):
                 pn.Param(self.param.percentual),
                 pn.widgets.TooltipIcon(value="If true, the Diff column is computed with\n(Algorithm2/Algorithm1)-1 instead of\nAlgorithm2-Algorithm1.")
             ), #added separate tooltip since the checkbox widget does not seem to support making a tooltip from the param doc
+            pn.pane.HTML("Further algorithms compared to Algorithm1", styles={'font-size': '10pt', 'font-family': 'Arial', 'padding-left': '10px'}),
+            pn.widgets.CrossSelector.from_param(self.param.variants, definition_order = False, width = 475, styles={'padding-left': '10px'}),
             pn.pane.Markdown("""
                 ### Information
                 Data is organized by attribute, then domain, then problem.
@@ -32,9 +38,12 @@ class DiffTablereport(Tablereport):
                 problem. Several popups can be open at the same time, but they
                 will be removed when the ReportType is changed.
 
+                Each further algorithm gets its own Diff column against
+                Algorithm1.
+
                 Numeric values are aggregated over the set of instances where
-                both algorithms have a value for the corresponding attribute.
-                They are also color-coded, with blue denoting a worse
+                all compared algorithms have a value for the corresponding
+                attribute. They are also color-coded, with blue denoting a worse
                 and green a better value.
                 """)
         ])
@@ -43,66 +52,94 @@ class DiffTablereport(Tablereport):
 
     def set_experiment_data_dependent_parameters(self):
         param_updates = super().set_experiment_data_dependent_parameters()
-        self.param.algorithm1.objects = ["--", *self.experiment_data.algorithms]
-        self.param.algorithm2.objects = ["--", *self.experiment_data.algorithms]
+        self.param.algorithm1.objects = {"--" : "--"} | self.algorithm_options()
+        self.param.algorithm2.objects = {"--" : "--"} | self.algorithm_options()
+        self.param.variants.objects = self.algorithm_options()
         param_updates["algorithm1"] = "--"
         param_updates["algorithm2"] = "--"
+        param_updates["variants"] = []
         return param_updates
 
 
-    def update_algorithm_names(self, mapping):
-        super().update_algorithm_names(mapping)
-        self.param.algorithm1.objects = ["--", *self.experiment_data.algorithms]
-        self.param.algorithm2.objects = ["--", *self.experiment_data.algorithms]
-        mapping["--"] = "--"
-        self.param.update({
-            "algorithm1": mapping[self.algorithm1],
-            "algorithm2": mapping[self.algorithm2]
-        })
+    def update_algorithm_names(self):
+        super().update_algorithm_names()
+        self.param.algorithm1.objects = {"--" : "--"} | self.algorithm_options()
+        self.param.algorithm2.objects = {"--" : "--"} | self.algorithm_options()
+        self.param.variants.objects = self.algorithm_options()
 
-    def get_view_table(self):
+    # Returns the algorithms compared to algorithm1, starting with algorithm2.
+    def get_compared_algorithms(self):
         if self.algorithm1 == "--" or self.algorithm2 == "--" or self.algorithm1 == self.algorithm2:
+            return []
+        return list(dict.fromkeys([self.algorithm2] + [x for x in self.variants if x != self.algorithm1]))
+
+
+    def get_diff_block(self, compared):
+        self.diff_engine.set_table(self.get_visible_table(), self.table_version)
+        return self.diff_engine.diff_block(self.algorithm1, compared, self.percentual)
+
+
+    def get_view_table(self):
+        compared = self.get_compared_algorithms()
+        if not compared:
             return pd.DataFrame()
 
-        mapping = dict()
-        retdata = self.table[["Index",self.algorithm1, self.algorithm2]].copy()
-        col1_numeric = pd.to_numeric(self.table[self.algorithm1], errors="coerce")
-        col2_numeric = pd.to_numeric(self.table[self.algorithm2], errors="coerce")
-        if self.percentual:
-            retdata["Diff"] = (col2_numeric / col1_numeric)-1
-        else:
-            retdata["Diff"] = col2_numeric - col1_numeric
-        return retdata
+        table = self.get_visible_table()
+        key = (self.algorithm1, tuple(compared), self.percentual, self.visible_table[0])
+        if self.view_table[0] != key:
+            diffs = self.get_diff_block(compared)
+            columns = {"Index": table["Index"], self.algorithm1: table[self.algorithm1]}
+            for j, algorithm in enumerate(compared):
+                columns[algorithm] = table[algorithm]
+                columns["Diff" if j == 0 else f"Diff {algorithm}"] = diffs[:, j]
+            self.view_table = (key, pd.DataFrame(columns, index=table.index))
+        return self.view_table[1]
+
+
+    def get_column_titles(self, columns):
+        titles = super().get_column_titles(columns)
+        for algorithm in self.get_compared_algorithms()[1:]:
+            if self.display_names[algorithm] != algorithm:
+                titles[f"Diff {algorithm}"] = f"Diff {self.display_names[algorithm]}"
+        return titles
 
 
     def get_current_columns(self):
-        if self.algorithm1 != "--" and self.algorithm2 != "--":
-            return [self.algorithm1, self.algorithm2]
-        else:
-            return []
+        compared = self.get_compared_algorithms()
+        return [self.algorithm1] + compared if compared else []
 
 
-    def style_table_by_row(self, row):
-        style = super().style_table_by_row(row)
-        attribute = row.name[0]
-        min_wins = self.experiment_data.attribute_info[attribute].min_wins
+    def get_style_key(self):
+        return (self.algorithm1, tuple(self.get_compared_algorithms()), self.percentual)
 
-        if min_wins is None:
-            return style
 
-        color = 'black'
-        if (row["Diff"] > 0 and min_wins) or (row["Diff"] < 0 and not min_wins):
-            color = 'red'
-        elif (row["Diff"] < 0 and min_wins) or (row["Diff"] > 0 and not min_wins):
-            color= 'green'
-        style[-1] += f"color: {color}"
-        return style
+    # values holds the columns of algorithm1 and the compared algorithms.
+    def compute_value_styles(self, attribute, values, min_wins):
+        diffs = diff_values(values[:, :1], values[:, 1:], self.percentual)
+        styles = np.full((len(values), 1 + 2*diffs.shape[1]), "", dtype=object)
+        colors = np.full(diffs.shape, "color: black", dtype=object)
+        colors[(diffs > 0) if min_wins else (diffs < 0)] = "color: red"
+        colors[(diffs < 0) if min_wins else (diffs > 0)] = "color: green"
+        styles[:, 2::2] = colors
+        return styles
 
 
     def get_params_as_dict(self):
-        return super().get_params_as_dict()
+        params = super().get_params_as_dict()
+
+        # shorten the variants parameter by using indices instead of the algorithm names
+        if "variants" in params:
+            params["variants"] = [self.param.variants.objects.index(a) for a in params["variants"]]
+        return params
 
 
     def set_params_from_dict(self, params):
         super().set_params_from_dict(params)
+        for name in ["algorithm1", "algorithm2"]:
+            if name in params:
+                params[name] = self.algorithms_from_names([params[name]])[0]
+        if "variants" in params:
+            # objects maps display names to algorithms, only the algorithms can be indexed
+            variants = list(self.param.variants.objects)
+            params["variants"] = [variants[x] for x in params["variants"]]
         self.param.update(params) #TODO: currently we need to make sure that the child calls this, maybe redesign...
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from propertiesloader import PropertiesColumns
+
+# Bump whenever the cached layout or the derived data (e.g. ipc scores) changes.
+CACHE_VERSION = "3"
+# Temporary entries that were not written to for this many seconds are left
+# over from interrupted writes.
+STALE_TMP_SECONDS = 3600
+# Seconds to wait for the headers of a url that is keyed.
+KEY_TIMEOUT = 10
+
+
+# Dictionary-encoded (problems x algorithms) matrix of a non-numeric
+# attribute. Indexing it decodes only the selected values, codes is -1 for
+# missing values.
+class EncodedColumn():
+    def __init__(self, codes, values):
+        self.codes = codes
+        # The last category is NaN such that code -1 decodes to it.
+        self.categories = np.full(len(values) + 1, np.nan, dtype=object)
+        for code, value in enumerate(values):
+            self.categories[code] = value
+        self.shape = codes.shape
+        self.dtype = np.dtype(object)
+
+    def __getitem__(self, key):
+        return self.categories[self.codes[key]]
+
+    def __array__(self, dtype=None, copy=None):
+        if copy is False:
+            raise ValueError("Decoding an EncodedColumn always creates a new array.")
+        values = self.categories[np.asarray(self.codes)]
+        return values if dtype is None else values.astype(dtype)
+
+
+# On-disk cache of parsed properties files, which is the columnar store of
+# the experiment data at the same time. Every entry is one directory holding
+# one .npy file per attribute (float64 matrices for numeric attributes,
+# dictionary-encoded int32 matrices for all others), the (domain, problem)
+# codes of the rows and a json header with everything else. If memmap is
+# set, entries are loaded as memory-mapped arrays such that only the parts
+# reports access are paged in. Entries are evicted least recently used first
+# once the cache exceeds max_size bytes.
+class ExperimentCache():
+    def __init__(self, directory, max_size=2*2**30, memmap=True):
+        self.logger = logging.getLogger("visualizer")
+        self.directory = directory
+        self.max_size = max_size
+        self.memmap = memmap
+        os.makedirs(self.directory, exist_ok=True)
+
+
+    # Returns a key identifying the content of the source, or None if the
+    # source cannot be identified without reading it completely (or cannot
+    # be accessed at all, which loading reports).
+    # Urls are keyed by their ETag/Last-Modified headers, which costs a HEAD
+    # request, so callers compute the key once per load. Local files are keyed by
+    # modification time and size and uploaded bytes and files by their content hash.
+    # extra identifies further inputs of the cached data (e.g. upper bounds).
+    def key(self, source, extra=""):
+        if hasattr(source, "getbuffer"):
+            identity = ["bytes", hashlib.sha256(source.getbuffer()).hexdigest()]
+        elif hasattr(source, "digest"):
+            identity = ["bytes", source.digest]
+        elif hasattr(source, "read") or not source:
+            return None
+        elif re.match(r"^[a-zA-Z][a-zA-Z0-9+.-]*://", source):
+            try:
+                with urllib.request.urlopen(urllib.request.Request(source, method="HEAD"), timeout=KEY_TIMEOUT) as response:
+                    validators = [response.headers.get("ETag"), response.headers.get("Last-Modified")]
+            except Exception:
+                return None
+            if not any(validators):
+                return None
+            identity = ["url", source, *[str(x) for x in validators]]
+        else:
+            try:
+                stat = os.stat(source)
+            except OSError:
+                return None
+            identity = ["file", os.path.abspath(source), str(stat.st_mtime_ns), str(stat.st_size)]
+        return hashlib.sha256("\0".join([CACHE_VERSION] + identity + [extra]).encode()).hexdigest()
+
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+
+    # Returns (properties, attribute_defaults) or None if key is not cached.
+    def load(self, key):
+        path = self.path(key)
+        mmap_mode = "r" if self.memmap else None
+        try:
+            with open(os.path.join(path, "header.json")) as f:
+                header = json.load(f)
+            columns = dict()
+            for i, attribute in enumerate(header["attributes"]):
+                matrix = np.load(os.path.join(path, f"column-{i}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+                if attribute not in header["numeric_attributes"]:
+                    matrix = EncodedColumn(matrix, header["categories"][attribute])
+                columns[attribute] = matrix
+            codes = np.load(os.path.join(path, "problem-codes.npy"), allow_pickle=False)
+            problem_index = pd.MultiIndex(levels=header["problem_levels"], codes=list(codes),
+                                          names=["domain", "problem"])
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self.logger.exception(f"Could not read cache entry {path}, discarding it.")
+            self.remove(key)
+            return None
+        # Touch the entry such that modification time reflects the last use.
+        os.utime(path)
+        properties = PropertiesColumns(header["algorithms"], header["domains"], problem_index,
+                                       header["attributes"], header["numeric_attributes"], columns)
+        attribute_defaults = {a : tuple(x) for a, x in header["attribute_defaults"].items()}
+        return properties, attribute_defaults
+
+
+    def store(self, key, properties, attribute_defaults):
+        header = {
+            "algorithms" : properties.algorithms,
+            "domains" : properties.domains,
+            "problem_levels" : [level.tolist() for level in properties.problem_index.levels],
+            "attributes" : properties.attributes,
+            "numeric_attributes" : properties.numeric_attributes,
+            "attribute_defaults" : attribute_defaults,
+            "categories" : dict(),
+        }
+
+        # Write to a temporary directory first such that readers never see partial entries.
+        tmp_path = tempfile.mkdtemp(dir=self.directory, suffix=".tmp")
+        try:
+            for i, attribute in enumerate(properties.attributes):
+                matrix = properties.columns[attribute]
+                if attribute not in properties.numeric_attributes:
+                    # Dictionary-encode the values, missing values get code -1.
+                    codes = dict()
+                    encoded = np.full(matrix.shape, -1, dtype=np.int32)
+                    for index, value in np.ndenumerate(np.asarray(matrix)):
+                        if isinstance(value, float) and np.isnan(value):
+                            continue
+                        encoded[index] = codes.setdefault(json.dumps(value), len(codes))
+                    header["categories"][attribute] = [json.loads(x) for x in codes.keys()]
+                    matrix = encoded
+                np.save(os.path.join(tmp_path, f"column-{i}.npy"), matrix, allow_pickle=False)
+            np.save(os.path.join(tmp_path, "problem-codes.npy"),
+                    np.array(properties.problem_index.codes, dtype=np.int32).reshape(2, -1), allow_pickle=False)
+            with open(os.path.join(tmp_path, "header.json"), "w") as f:
+                json.dump(header, f)
+            os.replace(tmp_path, self.path(key))
+        except Exception:
+            # Another process may have stored the same entry in the meantime.
+            if not os.path.exists(os.path.join(self.path(key), "header.json")):
+                self.logger.exception(f"Could not write cache entry for {key}.")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+        self.evict()
+
+
+    def remove(self, key):
+        shutil.rmtree(self.path(key), ignore_errors=True)
+
+
+    def remove_file(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+    # Returns the last time the directory or a file in it was written to.
+    def last_write(self, path):
+        return max([os.stat(path).st_mtime] + [entry.stat().st_mtime for entry in os.scandir(path)])
+
+
+    # Removes the least recently used entries until the cache fits into
+    # max_size, and what is left over from older versions and interrupted writes.
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            # Entries of older versions were single .npz files.
+            if name.endswith(".npz"):
+                self.remove_file(path)
+            if name.endswith(".tmp"):
+                try:
+                    if time.time() - self.last_write(path) > STALE_TMP_SECONDS:
+                        shutil.rmtree(path, ignore_errors=True)
+                except FileNotFoundError:
+                    pass
+                continue
+            if not os.path.isdir(path):
+                continue
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+                entries.append((os.stat(path).st_mtime, size, name))
+            except FileNotFoundError:
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_size:
+                break
+            self.remove(name)
+            total -= size
@@ -2,7 +2,11 @@ import json
 import logging
 import numpy as np
 import pandas as pd
-from io import StringIO
+
+from derivedviews import DerivedViews
+from propertiesloader import LoadCancelled, load_properties, stack_columns
+from upperbounds import load_upper_bounds, upper_bounds_files
+from wisematrix import WiseMatrixCache
 
 class Attribute():
     def __init__(self, name, default_min_wins = None, default_aggregator = None):
@@ -59,88 +63,179 @@ PREDEFINED_ATTRIBUTES = {
 }
 
 
+# Returns the default (min_wins, aggregator) of an attribute.
+def default_attribute_settings(attribute, numeric):
+    if attribute in PREDEFINED_ATTRIBUTES:
+        return PREDEFINED_ATTRIBUTES[attribute]
+    elif numeric:
+        min_wins = True if "memory" in attribute or "time" in attribute else False
+        return (min_wins, "sum")
+    else:
+        return (None, None)
+
+
+# Typed storage of the experiment data: one (problems x algorithms) matrix per
+# attribute, float64 for numeric attributes and object for all others. The
+# rows of all matrices follow problem_index, the columns follow algorithms.
+# The matrices are read-only since they can be shared between sessions.
+# Matrices loaded from the cache are memory-mapped, and non-numeric ones are
+# EncodedColumns that only decode the indexed values, so the store should be
+# indexed by rows or columns rather than converted as a whole.
+# store.loc[attribute] (or store[attribute]) gives the (domain, problem) x
+# algorithm frame of an attribute.
+class AttributeStore():
+    def __init__(self, problem_index, algorithms, columns, numeric_attributes):
+        self.problem_index = problem_index
+        self.algorithms = algorithms
+        self.columns = columns
+        self.numeric_attributes = numeric_attributes
+        for matrix in self.columns.values():
+            if isinstance(matrix, np.ndarray):
+                matrix.flags.writeable = False
+        # Rows are sorted by domain, so every domain is a contiguous block of rows.
+        self.block_domains = list(problem_index.levels[0])
+        self.domain_offsets = np.searchsorted(problem_index.codes[0], np.arange(len(self.block_domains)))
+
+    @property
+    def loc(self):
+        return self
+
+    def __getitem__(self, attribute):
+        return pd.DataFrame(np.asarray(self.columns[attribute]), index=self.problem_index, columns=self.algorithms, copy=False)
+
+    def __contains__(self, attribute):
+        return attribute in self.columns
+
+    # Returns the (attributes x problems x algorithms) float64 array of the
+    # given numeric attributes, restricted to the given algorithm positions.
+    def numeric_values(self, attributes, positions):
+        values = np.empty((len(attributes), len(self.problem_index), len(positions)))
+        for i, attribute in enumerate(attributes):
+            values[i] = self.columns[attribute][:, positions]
+        return values
+
+    # Returns a frame with one row per attribute holding the values of one problem.
+    def problem_frame(self, domain, problem):
+        attributes = sorted(self.columns.keys())
+        row = self.problem_index.get_loc((domain, problem))
+        values = np.empty((len(attributes), len(self.algorithms)), dtype=object)
+        for i, attribute in enumerate(attributes):
+            values[i] = self.columns[attribute][row]
+        return pd.DataFrame(values, index=pd.Index(attributes, name="attribute"), columns=self.algorithms)
+
+    # Stacks all attributes into one frame indexed by (attribute, domain, problem).
+    def to_frame(self):
+        return stack_columns(self.columns, self.problem_index, self.algorithms, self.numeric_attributes)
+
+
+# Loading reports its stages to progress if given, and raises LoadCancelled
+# if progress is cancelled before loading finished. The data is read from
+# and stored in cache under cache_key if both are given, the key identifies
+# properties_file and its upper bounds (see ExperimentRegistry.cache_key).
 class ExperimentData():
-    def __init__(self, properties_file=""):
+    def __init__(self, properties_file="", attributes=None, cache=None, progress=None, cache_key=None):
         self.logger = logging.getLogger("visualizer")
         try:
             self.logger.info(f"Reading properties file...")
-            self.data = pd.read_json(properties_file, orient="index")
-            self.attributes = [x for x in self.data.columns if x not in ["algorithm", "domain", "problem"]]
-            self.numeric_attributes = [x for x in self.attributes if pd.api.types.is_numeric_dtype(self.data.dtypes[x])]
-            self.algorithms = list(self.data.algorithm.unique())
-            self.domains = list(self.data.domain.unique())
-
-            # pivot such that the columns are a combination of algorithm-attribute, and then stack such that the attribute becomes part of the index
-            self.data = self.data.pivot(index=["domain","problem"], columns="algorithm", values=self.attributes).stack(0, dropna = False)
-            # pivot does not set a name for the newly created index column
-            self.data.index.names = ["domain","problem","attribute"]
-            # reorder and sort such that attribute is the first index column
-            self.data = self.data.reorder_levels(["attribute","domain","problem"])
-            self.data = self.data.sort_index()
-            # build a dicitonary that stores for every domain a list of problem names
-            self.problems = dict()
-            self.num_problems = 0
-            for domain in self.domains:
-                self.problems[domain] = [x for x in self.data.loc[(self.attributes[0],domain)].index.get_level_values('problem')]
-                self.num_problems  += len(self.problems[domain])
+            bounds_files = upper_bounds_files(properties_file)
+            if not cache or attributes is not None:
+                cache_key = None
+            cached = cache.load(cache_key) if cache_key else None
+            if cached:
+                properties, attribute_defaults = cached
+                self.logger.info(f"Using cached data for properties file.")
+            else:
+                properties = load_properties(properties_file, attributes, progress)
+                if progress:
+                    progress.stage("Computing ipc scores...")
+                self.compute_ipc_score(properties, bounds_files)
+                attribute_defaults = { a : default_attribute_settings(a, a in properties.numeric_attributes)
+                                       for a in properties.attributes }
+                if cache_key:
+                    cache.store(cache_key, properties, attribute_defaults)
+                    # Continue on the memory-mapped entry such that the parsed matrices can be freed.
+                    if cache.memmap:
+                        cached = cache.load(cache_key)
+                        if cached:
+                            properties = cached[0]
 
-            self.compute_ipc_score()
+            self.attributes = properties.attributes
+            self.numeric_attributes = properties.numeric_attributes
+            self.algorithms = properties.algorithms
+            self.domains = properties.domains
+            # problems are sorted per domain, num_problems counts (domain, problem) pairs
+            self.problems = properties.problems
+            self.num_problems = len(properties.problem_index)
+
+            self.data = AttributeStore(properties.problem_index, self.algorithms,
+                                       properties.columns, self.numeric_attributes)
 
             # generate Attribute classes for each attribute
             self.attribute_info = dict()
             for attribute in self.attributes:
-                a = None
-                if attribute in PREDEFINED_ATTRIBUTES:
-                    a = Attribute(attribute, PREDEFINED_ATTRIBUTES[attribute][0], PREDEFINED_ATTRIBUTES[attribute][1])
-                elif attribute in self.numeric_attributes:
-                    min_wins = True if "memory" in attribute or "time" in attribute else False
-                    a = Attribute(attribute, min_wins, "sum")
-                else:
-                    a = Attribute(attribute, None, None)
-                assert(a)
-                self.attribute_info[attribute] = a
+                min_wins, aggregator = attribute_defaults[attribute]
+                self.attribute_info[attribute] = Attribute(attribute, min_wins, aggregator)
 
             self.logger.info(f"Done reading properties file.")
-            self.original_data = self.data
-            self.original_algorithms = self.algorithms
 
+        except LoadCancelled:
+            raise
         except Exception as ex:
             self.algorithms = []
             self.domains = []
             self.problems = dict()
             self.attributes = []
             self.numeric_attributes = []
-            self.data = pd.DataFrame(index= pd.MultiIndex.from_tuples([],names = ["attribute","domain","problem"]))
+            self.data = AttributeStore(pd.MultiIndex.from_tuples([], names = ["domain","problem"]), [], dict(), [])
 
             if properties_file != "":
                 self.logger.warning(f"Could not read properties file.")
 
+        # Algorithms keep their names in the data, only reports show custom names.
+        self.display_names = { a : a for a in self.algorithms }
+        # Wise matrices only depend on the data, sessions share them.
+        self.wise_cache = WiseMatrixCache(self.data)
+        self.views = DerivedViews(self.data)
 
-    def compute_ipc_score(self):
-        if "cost" not in self.data.index.get_level_values(0):
-            return
-        upper_bounds = pd.read_json("upper_bounds.json", orient="index")
-        upper_bounds = upper_bounds.set_index(["domain","problem"])
-        costs = self.data.loc["cost"]
 
-        for with_upper in [True, False]:
-            tmp_data = costs.copy()
-            if with_upper:
-                tmp_data["upper_bounds"] = upper_bounds
-            min_costs = tmp_data.min(axis=1)
+    # Adds the ipc-sat-score columns (with and without the upper bounds from
+    # the given files) to properties. A problem's score is the lowest cost
+    # (or bound) divided by the algorithm's cost, 0 if the algorithm has no cost.
+    def compute_ipc_score(self, properties, bounds_files):
+        if "cost" not in properties.numeric_attributes:
+            return
+        costs = properties.columns["cost"]
+        upper_bounds = load_upper_bounds(bounds_files).lookup(properties.problem_index)
+        min_costs = np.fmin.reduce(costs, axis=1) if costs.shape[1] else np.full(len(costs), np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inverse_costs = 1 / costs
+            inverse_costs[np.isnan(inverse_costs)] = 0
+            properties.add_column("ipc-sat-score", inverse_costs * np.fmin(min_costs, upper_bounds)[:, np.newaxis], numeric=True)
+            properties.add_column("ipc-sat-score-no-planning-domains", inverse_costs * min_costs[:, np.newaxis], numeric=True)
+        properties.attributes = sorted(properties.attributes)
+        properties.numeric_attributes = sorted(properties.numeric_attributes)
 
-            score_data = (1/costs).fillna(0).multiply(min_costs, axis=0)
-            score_data["attribute"] = "ipc-sat-score" if with_upper else "ipc-sat-score-no-planning-domains"
-            score_data.set_index(["attribute", score_data.index], inplace=True)
-            self.data = pd.concat([self.data, score_data])
 
-        self.attributes = sorted(self.attributes + ["ipc-sat-score", "ipc-sat-score-no-planning-domains"])
-        self.numeric_attributes = sorted(self.numeric_attributes + ["ipc-sat-score", "ipc-sat-score-no-planning-domains"])
-        self.data = self.data.sort_values("attribute")
+# Per-session overlay on a (possibly shared) ExperimentData. Attribute
+# customizations and algorithm display names only live in the overlay, the
+# underlying ExperimentData is never modified. Everything not overridden
+# here is read from the underlying ExperimentData. Derived views are per
+# session since attribute customizations invalidate them.
+class SessionExperimentData():
+    def __init__(self, experiment_data):
+        self.shared = experiment_data
+        self.display_names = experiment_data.display_names
+        self.attribute_info = { name : Attribute(name, a.default_min_wins, a.default_aggregator)
+                                for name, a in getattr(experiment_data, "attribute_info", dict()).items() }
+        self.views = DerivedViews(experiment_data.data)
 
+    def __getattr__(self, name):
+        return getattr(self.shared, name)
 
     def set_attribute_customizations(self, min_wins, aggregators):
+        changed = []
         for name, a in self.attribute_info.items():
+            previous = (a.min_wins, a.aggregator)
             if name not in min_wins.keys():
                 a.reset_min_wins()
             else:
@@ -150,11 +245,16 @@ class ExperimentData():
                 a.reset_aggregator()
             else:
                 a.set_aggregator(aggregators[name])
+            if (a.min_wins, a.aggregator) != previous:
+                changed.append(name)
+        self.views.invalidate(changed)
 
+    # Sets the names under which reports show the algorithms. The data keeps
+    # the original names, so this neither copies nor invalidates anything.
+    # Returns whether any display name changed.
     def rename_columns(self, custom_algorithm_names):
-        old = self.data.columns
-        self.data = self.original_data.rename(columns = custom_algorithm_names)
-        new = self.data.columns
-        self.algorithms = [custom_algorithm_names[x] if x in custom_algorithm_names.keys() else x for x in self.original_algorithms]
-        return {o:n for (o,n) in zip(old,new) }
-
+        display_names = { a : custom_algorithm_names.get(a, a) for a in self.shared.algorithms }
+        if display_names == self.display_names:
+            return False
+        self.display_names = display_names
+        return True
@@ -0,0 +1,103 @@
+import hashlib
+import logging
+import re
+import threading
+
+from experimentdata import ExperimentData
+from upperbounds import upper_bounds_files, upper_bounds_identity
+
+
+class RegistryEntry():
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.experiment_data = None
+        self.references = 0
+
+
+# Process-wide registry handing out one shared ExperimentData per properties
+# source. Sessions acquire the data when loading a properties file and
+# release it when they switch to another file or are destroyed; the data is
+# dropped once no session references it anymore. The shared ExperimentData
+# must not be modified, per-session changes go into a SessionExperimentData.
+class ExperimentRegistry():
+    def __init__(self, cache=None):
+        self.logger = logging.getLogger("visualizer")
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.entries = dict()
+
+
+    # Returns the key of source and its upper bounds in the cache, or None
+    # if there is no cache or it cannot identify the source.
+    def cache_key(self, source):
+        if not self.cache:
+            return None
+        return self.cache.key(source, upper_bounds_identity(upper_bounds_files(source)))
+
+
+    # Sources with the same key are shared. If the cache can identify the
+    # content of a source, its cache_key is used, otherwise paths are keyed
+    # by themselves and uploaded bytes and files by their content hash. Urls
+    # the cache cannot identify are not shared, since their content may have
+    # changed since another session loaded them.
+    def key(self, source, cache_key=None):
+        if cache_key:
+            return cache_key
+        if hasattr(source, "digest"):
+            return source.digest
+        if isinstance(source, str):
+            return None if re.match(r"^[a-zA-Z][a-zA-Z0-9+.-]*://", source) else source
+        if hasattr(source, "getbuffer"):
+            return hashlib.sha256(source.getbuffer()).hexdigest()
+        return None
+
+
+    # Returns the shared ExperimentData of source, loading it if no session
+    # holds it yet. Raises LoadCancelled if progress is cancelled while this
+    # session loads the data, the source is not registered in that case (nor
+    # if loading raises anything else).
+    def acquire(self, source, progress=None):
+        # Keying a url costs a request, so the key is computed once and handed on.
+        cache_key = self.cache_key(source)
+        key = self.key(source, cache_key)
+        if key is None:
+            return ExperimentData(source, cache=self.cache, progress=progress)
+
+        with self.lock:
+            entry = self.entries.setdefault(key, RegistryEntry())
+            entry.references += 1
+
+        # Only sessions waiting for the same source block each other here.
+        with entry.lock:
+            if entry.experiment_data is not None:
+                self.logger.info(f"Using already loaded properties file.")
+                return entry.experiment_data
+            try:
+                experiment_data = ExperimentData(source, cache=self.cache, progress=progress, cache_key=cache_key)
+            except BaseException:
+                self.drop_reference(key, entry)
+                raise
+            # Don't share failed loads such that the next session retries.
+            if not experiment_data.algorithms:
+                self.drop_reference(key, entry)
+                return experiment_data
+            entry.experiment_data = experiment_data
+            return experiment_data
+
+
+    def drop_reference(self, key, entry):
+        with self.lock:
+            entry.references -= 1
+            if entry.references == 0:
+                del self.entries[key]
+
+
+    def release(self, experiment_data):
+        with self.lock:
+            for key, entry in self.entries.items():
+                if entry.experiment_data is experiment_data:
+                    entry.references -= 1
+                    if entry.references == 0:
+                        del self.entries[key]
+                    return
+
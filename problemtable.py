@@ -1,3 +1,4 @@
+import numpy as np
 import param
 import pandas as pd
 import panel as pn
@@ -5,6 +6,30 @@ import panel as pn
 from experimentdata import ExperimentData
 from report import Report
 
+HEX_DIGITS = np.array([f"{x:02x}" for x in range(256)], dtype=object)
+
+
+# Returns css color strings for a (rows x columns) float array, where the
+# values of each row are colored from blue (worst) to green (best). Rows
+# where all values are equal and missing values are not colored. min_wins
+# is a boolean or a boolean array with one entry per row.
+def gradient_styles(values, min_wins):
+    styles = np.full(values.shape, "", dtype=object)
+    if values.size == 0:
+        return styles
+    missing = np.isnan(values)
+    min_val = np.where(missing, np.inf, values).min(axis=1, keepdims=True)
+    max_val = np.where(missing, -np.inf, values).max(axis=1, keepdims=True)
+    colored = ~missing & (min_val != max_val)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percentage = (values - min_val) / (max_val - min_val)
+    percentage = np.where(np.reshape(min_wins, (-1, 1)), 1 - percentage, percentage)[colored]
+    green = (percentage*175).astype(int)
+    blue = ((1-percentage)*255).astype(int)
+    styles[colored] = "color: #00" + HEX_DIGITS[green] + HEX_DIGITS[blue] + ";"
+    return styles
+
+
 class ProblemTablereport(Report):
     domain = param.Selector(default="--")
     problem = param.Selector(default="--")
@@ -17,7 +42,8 @@ class ProblemTablereport(Report):
         self.data_view = pn.widgets.Tabulator(
                 value=pd.DataFrame(), disabled = True, sortable=False, pagination="remote", page_size=10000, widths=250,
                 frozen_columns = ["attribute"], show_index = False, sizing_mode=sizing_mode)
-        self.data_view.style.apply(func=self.style_table_by_row, axis=1)
+        self.style_cache = (None, None) # (key, styles) of the last styled table
+        self.data_view.style.apply(func=self.style_table, axis=None)
 
         self.param_view = pn.Column(
             pn.Param(self.param.domain),
@@ -41,16 +67,17 @@ class ProblemTablereport(Report):
         self.param.problem.objects = ["--"]
         param_updates["domain"] = self.param.domain.objects[0]
         param_updates["problem"] = self.param.problem.objects[0]
-        self.param.algorithms.objects = self.experiment_data.algorithms
+        self.param.algorithms.objects = self.algorithm_options()
         self.param.algorithms.default = self.experiment_data.algorithms
         param_updates["algorithms"] = self.experiment_data.algorithms
 
         self.data_view.formatters = { alg : {'type' : 'textarea'} for alg in self.experiment_data.algorithms }
+        self.style_cache = (None, None)
         return param_updates
 
-    def update_algorithm_names(self, mapping):
-        self.param.algorithms.objects = self.experiment_data.algorithms
-        self.algorithms = [mapping[x] for x in self.algorithms]
+    def update_algorithm_names(self):
+        super().update_algorithm_names()
+        self.param.algorithms.objects = self.algorithm_options()
 
 
 
@@ -62,34 +89,24 @@ class ProblemTablereport(Report):
         self.problem = self.param.problem.objects[0]
 
 
-    def style_table_by_row(self, row):
-        style = [""] * len(row)
-        attribute = row.iloc[0]
-        min_wins = self.experiment_data.attribute_info[attribute].min_wins
-        if min_wins is None:
-            return style
-
-        numeric_values = pd.to_numeric(row,errors='coerce')
-        min_val = numeric_values.dropna().min()
-        max_val = numeric_values.dropna().max()
-        if min_val == max_val:
-            return style
-        for i, val in enumerate(numeric_values):
-            if not pd.isnull(val):
-                percentage = (val - min_val) / (max_val-min_val)
-                if min_wins:
-                  percentage = 1-percentage
-                green = (percentage*175).astype(int)
-                blue = ((1-percentage)*255).astype(int)
-                style[i] = style[i]+ "color: #00{:02x}{:02x};".format(green, blue)
-        return style
+    def style_table(self, df):
+        min_wins = [self.experiment_data.attribute_info[a].min_wins for a in df.iloc[:, 0]]
+        key = (self.domain, self.problem, tuple(df.columns), tuple(min_wins))
+        if self.style_cache[0] != key:
+            values = df.iloc[:, 1:].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+            styles = np.full(df.shape, "", dtype=object)
+            styled = np.array([x is not None for x in min_wins], dtype=bool)
+            styles[styled, 1:] = gradient_styles(values[styled], np.array(min_wins)[styled].astype(bool))
+            self.style_cache = (key, styles)
+        return pd.DataFrame(self.style_cache[1], index=df.index, columns=df.columns)
 
 
     def update_data_view(self):
         if not self.problem or self.problem == "--":
             self.data_view.value = pd.DataFrame()
         else:
-            self.data_view.value = self.experiment_data.data[self.algorithms].xs((self.domain, self.problem), level=(1,2)).reset_index()
+            self.data_view.titles = { a : self.display_names[a] for a in self.algorithms if self.display_names[a] != a }
+            self.data_view.value = self.experiment_data.views.problem_slice(self.domain, self.problem)[self.algorithms].reset_index()
 
 
     def get_params_as_dict(self):
@@ -100,4 +117,4 @@ class ProblemTablereport(Report):
     def set_params_from_dict(self, params):
         self.domain = params["domain"]
         self.problem = params["problem"]
-        self.algorithms = params["algorithms"]
+        self.algorithms = self.algorithms_from_names(params["algorithms"])
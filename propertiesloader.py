@@ -0,0 +1,371 @@
+import bz2
+import codecs
+import contextlib
+import gzip
+import io
+import json
+import logging
+import lzma
+import os
+import re
+import tarfile
+import threading
+import time
+import urllib.request
+import zipfile
+from array import array
+
+import numpy as np
+import pandas as pd
+
+IDENTIFIERS = ["algorithm", "domain", "problem"]
+CHUNK_SIZE = 1 << 20
+# Number of parsed runs after which loading checks whether it was cancelled.
+PROGRESS_CHECK_RUNS = 10000
+# Per-run codes are collected as 64-bit integers on every platform ("l" is
+# only 32 bits on Windows) and read back as CODE_DTYPE.
+CODE_TYPECODE = "q"
+CODE_DTYPE = np.int64
+# Compressed streams are recognized by their first bytes.
+COMPRESSION_OPENERS = {
+    b"\x1f\x8b": lambda stream: gzip.GzipFile(fileobj=stream),
+    b"\xfd7zXZ\x00": lambda stream: lzma.LZMAFile(stream),
+    b"BZh": lambda stream: bz2.BZ2File(stream),
+}
+ZIP_MAGIC = b"PK\x03\x04"
+# Tar archives have "ustar" at this offset of their first header.
+TAR_MAGIC_OFFSET = 257
+TAR_MAGIC = b"ustar"
+# Only the member holding the properties is read from archives.
+PROPERTIES_MEMBER = re.compile(r"(^|/)properties(\.json)?$")
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+# Progress of loading one properties source. Loading logs its stages and
+# the number of read bytes to the visualizer logger, and can be cancelled
+# from another thread, in which case it raises LoadCancelled at the next check.
+class LoadProgress():
+    def __init__(self, log_interval=2.0):
+        self.logger = logging.getLogger("visualizer")
+        self.cancelled = threading.Event()
+        self.log_interval = log_interval
+        self.last_log = 0
+        self.bytes_read = 0
+        self.total_bytes = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise LoadCancelled()
+
+    def stage(self, message):
+        self.check()
+        self.logger.info(message)
+
+    def read(self, num_bytes):
+        self.check()
+        self.bytes_read += num_bytes
+        now = time.monotonic()
+        if now - self.last_log >= self.log_interval:
+            self.last_log = now
+            total = f" of {self.total_bytes / 2**20:.1f}" if self.total_bytes else ""
+            self.logger.info(f"Read {self.bytes_read / 2**20:.1f}{total} MB of the properties file...")
+
+
+# Binary stream reporting the bytes read from the underlying stream to a LoadProgress.
+class ProgressStream(io.RawIOBase):
+    def __init__(self, stream, progress):
+        self.stream = stream
+        self.progress = progress
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        self.progress.read(len(data))
+        return len(data)
+
+    def close(self):
+        self.stream.close()
+        super().close()
+
+
+# Returns the first size bytes of a binary stream without consuming them.
+def peek(stream, size):
+    if hasattr(stream, "peek"):
+        return stream.peek(size)[:size]
+    position = stream.tell()
+    data = stream.read(size)
+    stream.seek(position)
+    return data
+
+
+# Returns the properties member of a zip archive as binary stream. The
+# central directory is at the end of the archive, so archives that cannot
+# be seeked (downloads) are read into memory first.
+def open_zip_member(stream, stack):
+    if not stream.seekable():
+        stream = io.BytesIO(stream.read())
+    archive = stack.enter_context(zipfile.ZipFile(stream))
+    for name in archive.namelist():
+        if PROPERTIES_MEMBER.search(name):
+            return stack.enter_context(archive.open(name))
+    raise ValueError("Archive does not contain a properties file.")
+
+
+# Returns the properties member of a tar archive as binary stream, reading
+# the archive as a stream up to that member.
+def open_tar_member(stream, stack):
+    archive = stack.enter_context(tarfile.open(fileobj=stream, mode="r|"))
+    for member in archive:
+        if member.isfile() and PROPERTIES_MEMBER.search(member.name):
+            return stack.enter_context(archive.extractfile(member))
+    raise ValueError("Archive does not contain a properties file.")
+
+
+# Opens a properties source (path, url or file-like object) as a binary or
+# text stream. The format is detected from the content: gzip, xz and bz2
+# compressed files are decompressed while they are parsed, and only the
+# properties member is read from tar and zip archives (possibly compressed
+# as well). Opened streams are closed with stack, file-like sources are
+# left open. Reads of urls and paths are reported to progress if given.
+def open_properties(source, stack, progress=None):
+    if isinstance(source, io.TextIOBase):
+        return source
+    if hasattr(source, "read"):
+        stream = source
+    else:
+        if re.match(r"^[a-zA-Z][a-zA-Z0-9+.-]*://", source):
+            stream = stack.enter_context(urllib.request.urlopen(source))
+            total_bytes = stream.headers.get("Content-Length")
+        else:
+            stream = stack.enter_context(open(source, "rb"))
+            total_bytes = os.fstat(stream.fileno()).st_size
+        if progress:
+            progress.total_bytes = int(total_bytes) if total_bytes else None
+            stream = io.BufferedReader(ProgressStream(stream, progress), CHUNK_SIZE)
+
+    if peek(stream, len(ZIP_MAGIC)) == ZIP_MAGIC:
+        return open_zip_member(stream, stack)
+    magic = peek(stream, max(len(m) for m in COMPRESSION_OPENERS))
+    for prefix, opener in COMPRESSION_OPENERS.items():
+        if magic.startswith(prefix):
+            stream = stack.enter_context(opener(stream))
+            break
+    if peek(stream, TAR_MAGIC_OFFSET + len(TAR_MAGIC))[TAR_MAGIC_OFFSET:] == TAR_MAGIC:
+        return open_tar_member(stream, stack)
+    return stream
+
+
+# Yields (run id, run dictionary) pairs from a properties file without ever
+# holding more than one chunk plus one run of the raw json text in memory.
+def iter_runs(stream, chunk_size=CHUNK_SIZE):
+    # Binary streams are decoded chunk by chunk, they need not be seekable.
+    utf8 = None if isinstance(stream, io.TextIOBase) else codecs.getincrementaldecoder("utf-8")()
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r"\s*")
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+        if utf8:
+            chunk = utf8.decode(chunk, final=eof)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def next_token():
+        nonlocal pos
+        while True:
+            pos = whitespace.match(buffer, pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof:
+                raise ValueError("Unexpected end of properties file.")
+            fill()
+
+    def next_value():
+        nonlocal pos
+        while True:
+            try:
+                value, pos = decoder.raw_decode(buffer, pos)
+                return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+
+    if next_token() != "{":
+        raise ValueError("Properties file does not contain a json object.")
+    pos += 1
+    if next_token() == "}":
+        return
+    while True:
+        next_token()
+        run_id = next_value()
+        if next_token() != ":":
+            raise ValueError(f"Expected ':' after run id {run_id}.")
+        pos += 1
+        next_token()
+        yield run_id, next_value()
+        token = next_token()
+        pos += 1
+        if token == "}":
+            return
+        if token != ",":
+            raise ValueError(f"Expected ',' or '}}' after run {run_id}.")
+
+
+class PropertiesColumns():
+    def __init__(self, algorithms, domains, problem_index, attributes, numeric_attributes, columns):
+        self.algorithms = algorithms # in order of first appearance
+        self.domains = domains # in order of first appearance
+        self.problem_index = problem_index # (domain, problem) MultiIndex of the rows, sorted
+        self.attributes = attributes
+        self.numeric_attributes = numeric_attributes
+        self.columns = columns # attribute -> (problems x algorithms) array, rows sorted by (domain, problem)
+
+    # Returns domain -> sorted list of problem names, in the order of domains.
+    @property
+    def problems(self):
+        index = self.problem_index
+        offsets = np.searchsorted(index.codes[0], np.arange(len(index.levels[0]) + 1))
+        problems = { d : index.levels[1][index.codes[1][offsets[i]:offsets[i+1]]].tolist()
+                     for i, d in enumerate(index.levels[0]) }
+        return { d : problems[d] for d in self.domains }
+
+    def add_column(self, attribute, matrix, numeric):
+        self.columns[attribute] = matrix
+        self.attributes.append(attribute)
+        if numeric:
+            self.numeric_attributes.append(attribute)
+
+    def to_frame(self):
+        return stack_columns(self.columns, self.problem_index, self.algorithms, self.numeric_attributes)
+
+
+# Returns the names in codes (name -> code) in sorted order and the
+# position of every code in that order.
+def sorted_level(codes):
+    level = sorted(codes.keys())
+    positions = np.empty(len(level), dtype=np.int64)
+    positions[[codes[name] for name in level]] = np.arange(len(level))
+    return level, positions
+
+
+# Returns the sorted (domain, problem) MultiIndex of the given per-run domain
+# and problem codes, and the row of every run in it.
+def problem_index_from_codes(domain_codes, problem_codes, run_domains, run_problems):
+    domain_level, domain_positions = sorted_level(domain_codes)
+    problem_level, problem_positions = sorted_level(problem_codes)
+    keys = (domain_positions[np.asarray(run_domains, dtype=CODE_DTYPE)] * len(problem_level)
+            + problem_positions[np.asarray(run_problems, dtype=CODE_DTYPE)])
+    tasks, rows = np.unique(keys, return_inverse=True)
+    index = pd.MultiIndex(levels=[domain_level, problem_level],
+                          codes=[tasks // max(1, len(problem_level)), tasks % max(1, len(problem_level))],
+                          names=["domain", "problem"])
+    return index, rows
+
+
+# Stacks (problems x algorithms) attribute columns into one frame indexed by (attribute, domain, problem).
+def stack_columns(columns, row_index, algorithms, numeric_attributes):
+    attributes = sorted(columns.keys())
+    num_rows = len(row_index)
+    dtype = float if all(a in numeric_attributes for a in attributes) else object
+    values = np.empty((len(attributes)*num_rows, len(algorithms)), dtype=dtype)
+    for i, attribute in enumerate(attributes):
+        values[i*num_rows:(i+1)*num_rows] = columns[attribute]
+    index = pd.MultiIndex(
+        levels=[attributes, row_index.levels[0], row_index.levels[1]],
+        codes=[np.repeat(np.arange(len(attributes)), num_rows),
+               np.tile(row_index.codes[0], len(attributes)),
+               np.tile(row_index.codes[1], len(attributes))],
+        names=["attribute", "domain", "problem"])
+    return pd.DataFrame(values, index=index, columns=algorithms)
+
+
+# Reads a properties file run by run and fills one typed array per attribute.
+# Attributes are numeric as long as all their values are numbers (or null),
+# and are stored as float64 in that case. If attributes is given, all other
+# attributes are skipped while parsing. If the same (algorithm, domain, problem)
+# occurs several times, the last run wins. If progress is given, the stages
+# and read bytes are reported to it and loading stops once it is cancelled.
+def load_properties(source, attributes=None, progress=None):
+    wanted = None if attributes is None else set(attributes)
+    # Identifiers are interned as integer codes in order of first appearance.
+    algorithm_codes = dict()
+    domain_codes = dict()
+    problem_codes = dict()
+    run_algorithms = array(CODE_TYPECODE)
+    run_domains = array(CODE_TYPECODE)
+    run_problems = array(CODE_TYPECODE)
+    values = dict() # attribute -> array("d") while numeric, list otherwise
+    numeric_seen = set()
+    num_runs = 0
+
+    if progress:
+        progress.stage("Downloading and parsing the properties file...")
+    with contextlib.ExitStack() as stack:
+        stream = open_properties(source, stack, progress)
+        for _, run in iter_runs(stream):
+            algorithm, domain, problem = (run.pop(x) for x in IDENTIFIERS)
+            run_algorithms.append(algorithm_codes.setdefault(algorithm, len(algorithm_codes)))
+            run_domains.append(domain_codes.setdefault(domain, len(domain_codes)))
+            run_problems.append(problem_codes.setdefault(problem, len(problem_codes)))
+
+            for attribute, value in run.items():
+                if (wanted is not None and attribute not in wanted) or attribute in values:
+                    continue
+                values[attribute] = array("d", [np.nan]) * num_runs
+            for attribute, column in values.items():
+                value = run.get(attribute)
+                if isinstance(column, array):
+                    if value is None:
+                        column.append(np.nan)
+                        continue
+                    # bool is an int, but boolean attributes are not numeric.
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        column.append(value)
+                        numeric_seen.add(attribute)
+                        continue
+                    column = values[attribute] = [None if np.isnan(x) else x for x in column]
+                column.append(value)
+            num_runs += 1
+            if progress and num_runs % PROGRESS_CHECK_RUNS == 0:
+                progress.check()
+
+    # Sort tasks by (domain, problem) and scatter the runs into dense matrices.
+    if progress:
+        progress.stage(f"Parsed {num_runs} runs, building the attribute matrices...")
+    problem_index, rows = problem_index_from_codes(domain_codes, problem_codes, run_domains, run_problems)
+    cols = np.frombuffer(run_algorithms, dtype=CODE_DTYPE) if num_runs else np.empty(0, dtype=CODE_DTYPE)
+    shape = (len(problem_index), len(algorithm_codes))
+
+    columns = dict()
+    numeric_attributes = []
+    for attribute, column in values.items():
+        if isinstance(column, array) and attribute in numeric_seen:
+            matrix = np.full(shape, np.nan)
+            matrix[rows, cols] = np.frombuffer(column, dtype=np.float64)
+            numeric_attributes.append(attribute)
+        else:
+            matrix = np.full(shape, np.nan, dtype=object)
+            if isinstance(column, array):
+                column = [None] * num_runs
+            matrix[rows, cols] = np.fromiter(
+                (np.nan if x is None else x for x in column), dtype=object, count=num_runs)
+        columns[attribute] = matrix
+
+    return PropertiesColumns(list(algorithm_codes.keys()), list(domain_codes.keys()), problem_index,
+                             list(values.keys()), numeric_attributes, columns)
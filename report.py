@@ -9,6 +9,7 @@ class Report(param.Parameterized):
         super().__init__(**params)
         self.logger = logging.getLogger("visualizer")
         self.experiment_data = experiment_data
+        self.display_names = experiment_data.display_names # algorithm -> shown name, as of the last update
         self.param_view = pn.pane.Str("Placeholder Param View")
         self.data_view = pn.pane.Str("Placeholder Data View")
         self.data_view_column = pn.Column(self.data_view, pn.Column(height=0, width=0), sizing_mode='stretch_both', scroll=True)
@@ -19,16 +20,36 @@ class Report(param.Parameterized):
         param_updates = self.set_experiment_data_dependent_parameters()
         self.param.update(param_updates)
 
-    def update_algorithm_names(self, mapping):
-        pass
+    # Called when the display names of the algorithms changed. Parameters
+    # always hold the original algorithm names, only what is shown changes.
+    def update_algorithm_names(self):
+        self.display_names = self.experiment_data.display_names
 
 
     # Returns a dictionary of parameters and values they should be set to
     # This dicitionary is batch updated in update_experiment_data.
     def set_experiment_data_dependent_parameters(self):
+        self.display_names = self.experiment_data.display_names
         return dict()
 
 
+    # Returns {display name : algorithm} for the given algorithms (all by
+    # default), used as objects of algorithm selectors.
+    def algorithm_options(self, algorithms=None):
+        if algorithms is None:
+            algorithms = self.experiment_data.algorithms
+        return { self.display_names[a] : a for a in algorithms }
+
+
+    # Returns the algorithms with the given names. Configurations saved while
+    # custom names relabeled the data refer to algorithms by their custom
+    # names, these are mapped back to the algorithms.
+    def algorithms_from_names(self, names):
+        algorithms = { n : a for a, n in self.experiment_data.display_names.items() }
+        algorithms |= { a : a for a in self.experiment_data.algorithms }
+        return [algorithms.get(n, n) for n in names]
+
+
     def view_param(self):
         self.update_param_view()
         return self.param_view
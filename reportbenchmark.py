@@ -0,0 +1,224 @@
+#! /usr/bin/env python3
+
+# Times the computations behind every report on a synthetic experiment and
+# measures their peak memory, without a browser. Every pass runs in a fresh
+# subprocess: timing passes run untraced, the memory pass traces allocations
+# with tracemalloc (which slows down pure Python code). The results are
+# written as json, --compare shows how the operations of two runs differ.
+#
+#   ./reportbenchmark.py --domains 40 --problems 50 --algorithms 80 --attributes 60 --output after.json
+#   ./reportbenchmark.py --compare before.json after.json
+
+import argparse
+from importlib import metadata
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmark import write_synthetic_properties
+
+WILDCARD_ENTRIES = "*base* *v1*"
+# 0: attribute aggregates only, 1: attributes unfolded, 2: attributes and domains unfolded
+FOLD_DEPTHS = [0, 1, 2]
+
+
+# Runs function and returns its result and how long it took, plus the peak
+# of the memory allocated while it ran if allocations are traced.
+def measure(function, traced):
+    if traced:
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    result = function()
+    measurement = {"seconds": time.perf_counter() - start}
+    if traced:
+        measurement["peak_memory_mb"] = (tracemalloc.get_traced_memory()[1] - memory_before) / 2**20
+    return result, measurement
+
+
+def set_fold_depth(report, depth):
+    attributes = report.experiment_data.attributes
+    report.unfolded = dict() if depth == 0 else { a : list(report.domains) if depth == 2 else [] for a in attributes }
+
+
+# Runs all benchmarked operations in order and returns one result per operation.
+def run_operations(path, traced):
+    # Imported before measuring so that imports do not count towards the first operation.
+    from absolutetable import AbsoluteTablereport
+    from cactus import Cactusplot
+    from difftable import DiffTablereport
+    from experimentdata import ExperimentData, SessionExperimentData
+    from propertiesloader import PropertiesColumns
+    from scatter import Scatterplot
+    from upperbounds import upper_bounds_files
+    from wisetable import WiseTablereport
+
+    if traced:
+        tracemalloc.start()
+    results = []
+    def run(operation, function, **params):
+        result, measurement = measure(function, traced)
+        results.append({"operation": operation, **params, **measurement})
+        return result
+
+    shared = run("ExperimentData", lambda: ExperimentData(path))
+    # compute_ipc_score on the parsed columns, which it only extends by the scores.
+    ipc_attributes = ["ipc-sat-score", "ipc-sat-score-no-planning-domains"]
+    properties = PropertiesColumns(shared.algorithms, shared.domains, shared.data.problem_index,
+                                   [a for a in shared.attributes if a not in ipc_attributes],
+                                   [a for a in shared.numeric_attributes if a not in ipc_attributes],
+                                   { a : m for a, m in shared.data.columns.items() if a not in ipc_attributes })
+    run("compute_ipc_score", lambda: shared.compute_ipc_score(properties, upper_bounds_files(path)))
+
+    data = SessionExperimentData(shared)
+    algorithms = data.algorithms
+    numeric_attributes = data.numeric_attributes
+    attribute = next((a for a in ["expansions", "cost"] if a in numeric_attributes), numeric_attributes[0])
+
+    absolute = AbsoluteTablereport(data)
+    run("Tablereport.aggregate_where_necessary", absolute.aggregate_where_necessary, report="absolute", change="initial")
+    absolute.domains = data.domains[::2]
+    run("Tablereport.aggregate_where_necessary", absolute.aggregate_where_necessary, report="absolute", change="domains")
+    absolute.domains = data.domains
+    absolute.aggregate_where_necessary()
+    data.set_attribute_customizations(dict(), { a : "mean" for a in numeric_attributes })
+    run("Tablereport.aggregate_where_necessary", absolute.aggregate_where_necessary, report="absolute", change="aggregators")
+    for depth in FOLD_DEPTHS:
+        set_fold_depth(absolute, depth)
+        view = run("Tablereport.get_view_table", absolute.get_view_table, report="absolute", depth=depth)
+        run("Tablereport.filter", lambda: absolute.filter(view), report="absolute", depth=depth, rows=len(view))
+        run("Tablereport.style_table", lambda: absolute.style_table(view), report="absolute", depth=depth, rows=len(view))
+
+    diff = DiffTablereport(data, { "algorithm1" : algorithms[0], "algorithm2" : algorithms[min(1, len(algorithms) - 1)] })
+    diff.aggregate_where_necessary()
+    for depth in FOLD_DEPTHS:
+        set_fold_depth(diff, depth)
+        view = run("DiffTablereport.get_view_table", diff.get_view_table, report="diff", depth=depth)
+        run("Tablereport.style_table", lambda: diff.style_table(view), report="diff", depth=depth, rows=len(view))
+
+    for group_by in ["name", "domain"]:
+        scatter = Scatterplot(data, { "x_attribute" : attribute, "y_attribute" : attribute,
+                                      "entries_list" : WILDCARD_ENTRIES, "group_by" : group_by })
+        run("Scatterplot.update_data_view", scatter.update_data_view, entries=WILDCARD_ENTRIES,
+            group_by=group_by, pairs=len(scatter.get_algorithm_pairs()))
+
+    cactus = Cactusplot(data, { "attribute" : attribute })
+    run("Cactusplot.update_data_view", cactus.update_data_view, algorithms=len(cactus.algorithms))
+
+    wise = WiseTablereport(data, { "attribute" : attribute })
+    run("WiseTablereport.update_data_view", wise.update_data_view, cached=False)
+    run("WiseTablereport.update_data_view", wise.update_data_view, cached=True)
+    return results
+
+
+# Runs one pass in a fresh subprocess and returns its results and peak RSS.
+def run_pass(path, mode):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", mode, os.path.abspath(path)],
+                            capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(output.stdout)
+
+
+def environment():
+    versions = dict()
+    for package in ["numpy", "pandas", "panel", "bokeh", "param"]:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {"python": platform.python_version(), "platform": platform.platform(), **versions}
+
+
+MEASUREMENTS = ["seconds", "all_seconds", "peak_memory_mb"]
+
+
+# Identifies an operation across runs by its name and parameters.
+def operation_key(result):
+    return json.dumps({ k : v for k, v in result.items() if k not in MEASUREMENTS }, sort_keys=True)
+
+
+def describe(result):
+    params = ", ".join(f"{k}={v}" for k, v in result.items() if k not in MEASUREMENTS + ["operation"])
+    return f"{result['operation']:<40} {params:<45} {result['seconds']:8.3f}s"
+
+
+def compare(baseline_file, current_file):
+    with open(baseline_file) as f:
+        baseline = { operation_key(r) : r for r in json.load(f)["results"] }
+    with open(current_file) as f:
+        current = json.load(f)["results"]
+    for result in current:
+        before = baseline.get(operation_key(result))
+        line = describe(result)
+        if before:
+            line += f" ({result['seconds'] / max(before['seconds'], 1e-9):5.2f}x)"
+        if "peak_memory_mb" in result:
+            line += f"  {result['peak_memory_mb']:8.1f} MB"
+            if before and "peak_memory_mb" in before:
+                line += f" ({result['peak_memory_mb'] / max(before['peak_memory_mb'], 1e-9):5.2f}x)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--domains", type=int, default=20)
+    parser.add_argument("--problems", type=int, default=50, help="problems per domain")
+    parser.add_argument("--algorithms", type=int, default=20)
+    parser.add_argument("--attributes", type=int, default=20, help="numeric attributes per run")
+    parser.add_argument("--missing", type=float, default=0.1, help="probability that a value is missing")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="number of timing passes, the fastest counts")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the traced memory pass")
+    parser.add_argument("--directory", default=".")
+    parser.add_argument("--output", help="json file for the results instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"))
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.measure:
+        mode, path = args.measure
+        results = run_operations(path, traced=(mode == "memory"))
+        print(json.dumps({"results": results,
+                          "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+        return
+
+    experiment = {"domains": args.domains, "problems": args.problems, "algorithms": args.algorithms,
+                  "attributes": args.attributes, "missing": args.missing, "seed": args.seed}
+    path = os.path.join(args.directory, "properties-{domains}x{problems}x{algorithms}x{attributes}-{missing}-{seed}.json".format(**experiment))
+    if not os.path.exists(path):
+        print(f"Writing {path}...", file=sys.stderr)
+        write_synthetic_properties(path, args.domains * args.problems * args.algorithms, args.algorithms, args.seed,
+                                   problems_per_domain=args.problems, num_attributes=args.attributes, missing=args.missing)
+    experiment |= {"runs": args.domains * args.problems * args.algorithms, "file_size_mb": os.path.getsize(path) / 2**20}
+
+    passes = [run_pass(path, "time") for _ in range(args.repeat)]
+    results = passes[0]["results"]
+    for i, result in enumerate(results):
+        result["all_seconds"] = [p["results"][i]["seconds"] for p in passes]
+        result["seconds"] = min(result["all_seconds"])
+    if args.memory:
+        for result, traced in zip(results, run_pass(path, "memory")["results"]):
+            result["peak_memory_mb"] = traced["peak_memory_mb"]
+    for result in results:
+        memory = f"  {result['peak_memory_mb']:8.1f} MB" if "peak_memory_mb" in result else ""
+        print(describe(result) + memory, file=sys.stderr)
+
+    output = {"experiment": experiment, "environment": environment(),
+              "peak_rss_mb": max(p["peak_rss_mb"] for p in passes), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+    else:
+        print(json.dumps(output, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 from bokeh.plotting import figure
-from bokeh.models import HoverTool, TapTool, Legend, LegendItem, Span
+from bokeh.models import ColorBar, ColumnDataSource, HoverTool, TapTool, Legend, LegendItem, Span
+from bokeh.palettes import Viridis256
+from bokeh.transform import log_cmap
 from functools import partial
 import math
 import numpy as np
@@ -22,13 +24,31 @@ MARKERS = ["x", "circle", "square", "triangle", "asterisk",
            "circle_x", "square_x", "square_pin", "triangle_pin"]
 COLORS = ["black", "red", "blue", "teal", "orange",
           "purple", "olive", "lime", "cyan"]
-
-def get_num_true(df):
-    vc = df.value_counts()
-    if True not in vc.index:
-        return 0
-    else:
-        return vc[True]
+# Number of bins per axis when points are binned.
+SCATTER_BINS = 200
+
+# Maps the names of algorithms with a substring removed to these algorithms,
+# built lazily per substring.
+class AlgorithmNameIndex():
+    def __init__(self, algorithms):
+        self.algorithms = algorithms
+        self.stripped = dict() # substring -> stripped name -> algorithms containing substring
+
+    def matching(self, substring):
+        if substring not in self.stripped:
+            index = dict()
+            for alg in self.algorithms:
+                if substring in alg:
+                    index.setdefault(alg.replace(substring, ""), []).append(alg)
+            self.stripped[substring] = index
+        return self.stripped[substring]
+
+    # Returns all (alg, alg2) pairs where alg contains x_substring, alg2
+    # contains y_substring and both are equal without these substrings.
+    def pairs(self, x_substring, y_substring):
+        y_index = self.matching(y_substring)
+        return [(alg, alg2) for alg in self.algorithms if x_substring in alg
+                for alg2 in y_index.get(alg.replace(x_substring, ""), [])]
 
 
 class Scatterplot(Report):
@@ -65,6 +85,10 @@ class Scatterplot(Report):
     marker_fill_alpha = param.Number(default = 0.0, bounds=(0.0,1.0))
     markers = param.List(default=MARKERS)
     colors = param.List(default=COLORS)
+    webgl_threshold = param.Integer(default = 10000, bounds = (0, None),
+        doc = "Above this many points, the plot is rendered with WebGL and only sends the coordinates to the browser.")
+    binning_threshold = param.Integer(default = 200000, bounds = (0, None),
+        doc = "Above this many points, points are binned into a density plot. Clicking a bin lists its points.")
 
 
     def __init__(self, experiment_data = ExperimentData(), param_dict = dict(), **params):
@@ -90,6 +114,8 @@ class Scatterplot(Report):
             pn.Param(self.param.marker_fill_alpha),
             pn.Param(self.param.markers),
             pn.Param(self.param.colors),
+            pn.Param(self.param.webgl_threshold),
+            pn.Param(self.param.binning_threshold),
             pn.pane.Markdown("""
                 ### Information
                 Clicking on a datapoint will highlight this point and open a
@@ -97,10 +123,19 @@ class Scatterplot(Report):
                 Clicking anywhere else in the plot removes the highlight.
                 Several popups can be open at the same time, but they will be
                 removed when the ReportType is changed.
+
+                Plots with more than webgl_threshold points only show the
+                coordinates when hovering. Plots with more than
+                binning_threshold points show the number of points per bin,
+                clicking on a bin lists its points.
             """)
 
         )
         self.data_view_in_progress = False
+        self.name_index = AlgorithmNameIndex([])
+        self.algorithm_pairs = (None, []) # (entries_list, pairs) of the last parsed entries
+        self.plot_pairs = [] # algorithm pairs of the current plot
+        self.plot_frame = pd.DataFrame() # x, y, yrel, pair and task of every point in the current plot, sorted by group
         param_dict = self.set_experiment_data_dependent_parameters() | param_dict
         self.param.update(param_dict)
 
@@ -111,17 +146,25 @@ class Scatterplot(Report):
         param_updates["x_attribute"] = "--"
         self.param.y_attribute.objects = ["--", *self.experiment_data.numeric_attributes]
         param_updates["y_attribute"] = "--"
-        param_updates["available_algorithms"] =  "{}".format("\n".join(self.experiment_data.algorithms))
+        param_updates["available_algorithms"] =  "{}".format("\n".join(self.algorithm_options().keys()))
+        self.name_index = AlgorithmNameIndex(list(self.algorithm_options().keys()))
+        self.algorithm_pairs = (None, [])
         return param_updates
 
 
-    def update_algorithm_names(self, mapping):
+    # Entries are written with display names, so they are renamed as well.
+    def update_algorithm_names(self):
+        mapping = { self.display_names[a] : name for a, name in self.experiment_data.display_names.items() }
+        super().update_algorithm_names()
+        self.name_index = AlgorithmNameIndex(list(self.algorithm_options().keys()))
+        self.algorithm_pairs = (None, [])
         updates = {}
-        updates["available_algorithms"] = "{}".format("\n".join(self.experiment_data.algorithms))
-        # source: https://code.activestate.com/recipes/81330-single-pass-multiple-replace/
-        regex = re.compile("(%s)" % "|".join(map(re.escape, mapping.keys())))
-        new_entries_list = regex.sub(lambda mo: mapping[mo.string[mo.start():mo.end()]], self.entries_list)
-        updates["entries_list"] = new_entries_list
+        updates["available_algorithms"] = "{}".format("\n".join(self.algorithm_options().keys()))
+        if mapping:
+            # source: https://code.activestate.com/recipes/81330-single-pass-multiple-replace/
+            regex = re.compile("(%s)" % "|".join(map(re.escape, mapping.keys())))
+            new_entries_list = regex.sub(lambda mo: mapping[mo.string[mo.start():mo.end()]], self.entries_list)
+            updates["entries_list"] = new_entries_list
         self.param.update(updates)
 
     @param.depends('autoscale', watch=True)
@@ -131,7 +174,12 @@ class Scatterplot(Report):
         self.param.y_range.precedence = value
 
 
+    # Returns (x algorithm, y algorithm, name) of all valid entries. Entries
+    # refer to algorithms by their display names.
     def get_algorithm_pairs(self):
+        if self.algorithm_pairs[0] == self.entries_list:
+            return self.algorithm_pairs[1]
+        algorithms = self.algorithm_options()
         entries = []
         for line in self.entries_list.splitlines():
             xalg = yalg = name = ""
@@ -146,16 +194,13 @@ class Scatterplot(Report):
             else:
                 continue
             if xalg[0] == xalg[-1] == yalg[0] == yalg[-1] == '*':
-                x_substring = xalg[1:-1]
-                y_substring = yalg[1:-1]
-                for alg in self.experiment_data.algorithms:
-                    if x_substring in alg:
-                        for alg2 in self.experiment_data.algorithms:
-                            if y_substring in alg2 and alg.replace(x_substring, "") == alg2.replace(y_substring, ""):
-                                entries.append((alg, alg2, f"{alg} vs {alg2}"))
-            invalid_algorithms = [alg for alg in [xalg,yalg] if alg not in self.experiment_data.algorithms]
+                for alg, alg2 in self.name_index.pairs(xalg[1:-1], yalg[1:-1]):
+                    entries.append((algorithms[alg], algorithms[alg2], f"{alg} vs {alg2}"))
+                continue
+            invalid_algorithms = [alg for alg in [xalg,yalg] if alg not in algorithms]
             if not invalid_algorithms:
-                entries.append((xalg,yalg,name))
+                entries.append((algorithms[xalg],algorithms[yalg],name))
+        self.algorithm_pairs = (self.entries_list, entries)
         return entries
 
 
@@ -164,16 +209,83 @@ class Scatterplot(Report):
         new_set = set(new)
         change = list((old_set - new_set) | (new_set - old_set))
         if change:
-            dom = df.iloc[change[0]]['domain']
-            prob = df.iloc[change[0]]['problem']
-            param_dict = {
-                "domain" : dom,
-                "problem": prob,
-                "algorithms": df.iloc[change[0]]['algs']
-            }
-            problem_report = ProblemTablereport(self.experiment_data, param_dict,
-                sizing_mode = "stretch_width")
-            self.add_popup(problem_report.view_data, name=f"{dom} - {prob}")
+            self.open_problem_report(df.iloc[change[0]])
+
+
+    # Opens the problem report of a point (a row of self.plot_frame).
+    def open_problem_report(self, point):
+        dom, prob = self.experiment_data.data.problem_index[int(point['task'])]
+        xalg, yalg, _ = self.plot_pairs[int(point['pair'])]
+        param_dict = {
+            "domain" : dom,
+            "problem": prob,
+            "algorithms": [xalg] if xalg == yalg else [xalg, yalg]
+        }
+        problem_report = ProblemTablereport(self.experiment_data, param_dict,
+            sizing_mode = "stretch_width")
+        self.add_popup(problem_report.view_data, name=f"{dom} - {prob}")
+
+
+    # Returns the points (rows of self.plot_frame) with their domain, problem and name.
+    def describe_points(self, points):
+        index = self.experiment_data.data.problem_index
+        task = points['task'].to_numpy()
+        names = np.array([name for _, _, name in self.plot_pairs], dtype=object)
+        return pd.DataFrame({
+            'domain': index.levels[0].to_numpy()[index.codes[0][task]],
+            'problem': index.levels[1].to_numpy()[index.codes[1][task]],
+            'name': names[points['pair'].to_numpy()],
+            'x': points['x'].to_numpy(), 'y': points['y'].to_numpy(), 'yrel': points['yrel'].to_numpy()})
+
+
+    # Clicking on a bin opens the problem report if the bin has a single
+    # point and a table of its points (which can be clicked) otherwise.
+    def on_bin_click_callback(self, attr, old, new, df, bins):
+        old_set = set(old) if old else set()
+        new_set = set(new)
+        change = list((old_set - new_set) | (new_set - old_set))
+        if not change:
+            return
+        points = df[bins == change[0]]
+        if len(points) == 1:
+            self.open_problem_report(points.iloc[0])
+            return
+        table = pn.widgets.Tabulator(self.describe_points(points), disabled = True, pagination="remote", page_size=100)
+        table.on_click(lambda e: self.open_problem_report(points.iloc[e.row]))
+        self.add_popup(table, name=f"{len(points)} points")
+
+
+    # Returns a source with only the float32 coordinates of the points in df.
+    def get_compact_source(self, df):
+        return ColumnDataSource({col : df[col].to_numpy(dtype=np.float32) for col in ['x', 'y', 'yrel']})
+
+
+    # Adds one quad per non-empty bin of a SCATTER_BINS x SCATTER_BINS grid
+    # over the points, colored by the number of points in the bin.
+    def add_binned_points(self, plot, df, xcol, ycol):
+        edges = []
+        codes = []
+        for values, scale in [(df[xcol].to_numpy(dtype=float), self.x_scale), (df[ycol].to_numpy(dtype=float), self.y_scale)]:
+            transformed = np.log10(values) if scale == "log" else values
+            low, high = transformed.min(), transformed.max()
+            if low == high:
+                low, high = low - 0.5, high + 0.5
+            edge = np.linspace(low, high, SCATTER_BINS + 1)
+            edges.append(10 ** edge if scale == "log" else edge)
+            codes.append(np.clip(((transformed - low) / (high - low) * SCATTER_BINS).astype(int), 0, SCATTER_BINS - 1))
+        cells, bins, counts = np.unique(codes[0] * SCATTER_BINS + codes[1], return_inverse=True, return_counts=True)
+        xbin, ybin = np.divmod(cells, SCATTER_BINS)
+        source = ColumnDataSource({
+            'left': edges[0][xbin], 'right': edges[0][xbin + 1],
+            'bottom': edges[1][ybin], 'top': edges[1][ybin + 1],
+            'count': counts.astype(np.int32),
+        })
+        mapper = log_cmap('count', Viridis256, 1, max(2, counts.max()))
+        p = plot.quad(left='left', right='right', bottom='bottom', top='top', source=source,
+                      fill_color=mapper, line_color=None)
+        p.data_source.selected.on_change('indices', partial(self.on_bin_click_callback, df=df, bins=bins))
+        plot.add_layout(ColorBar(color_mapper=mapper['transform'], title="points"), 'right')
+        plot.add_tools(HoverTool(tooltips=[('points', '@count')]))
 
 
     def update_data_view(self):
@@ -185,50 +297,52 @@ class Scatterplot(Report):
 
         self.data_view_in_progress = True
 
-        # Build the DataFrame used in the plot.
-        frames = []
-        index_order = [self.group_by, 'domain' if self.group_by == 'name' else 'name', 'problem']
-        for (xalg, yalg, name) in algorithm_pairs:
-            xcol = self.experiment_data.data.loc[self.x_attribute][xalg]
-            ycol = self.experiment_data.data.loc[self.y_attribute][yalg]
-            algs = [xalg] if xalg == yalg else [xalg, yalg]
-            new_frame = pd.DataFrame({'x':xcol, 'y':ycol, 'yrel': ycol, 'name':name, 'algs': [algs]*len(xcol)}).reset_index().set_index(index_order)
-            frames.append(new_frame)
-        overall_frame = pd.concat(frames)
-        overall_frame.replace(0, self.replace_zero, inplace=True)
-        overall_frame.sort_index(level=0, inplace=True)
-        overall_frame['yrel'] = overall_frame.y.div(overall_frame.x.replace(0,  np.nan))
-        xcol = 'x'
-        ycol = 'y' if not self.relative else 'yrel'
-
+        # Gather the x and y values of all pairs at once, one point per (pair, task).
+        store = self.experiment_data.data
+        num_tasks = len(store.problem_index)
+        views = self.experiment_data.views
+        x = views.numeric_block(self.x_attribute, [xalg for xalg, _, _ in algorithm_pairs]).T.ravel()
+        y = views.numeric_block(self.y_attribute, [yalg for _, yalg, _ in algorithm_pairs]).T.ravel()
+        pair = np.repeat(np.arange(len(algorithm_pairs)), num_tasks)
+        task = np.tile(np.arange(num_tasks), len(algorithm_pairs))
+        x = np.where(x == 0, self.replace_zero, x)
+        y = np.where(y == 0, self.replace_zero, y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            yrel = y / np.where(x == 0, np.nan, x)
+        xvals = x
+        yvals = yrel if self.relative else y
+
+        keep = np.ones(len(x), dtype=bool)
         if self.x_scale == "log":
-            overall_frame = overall_frame[~(overall_frame[xcol] <= 0)]
+            keep &= ~(xvals <= 0)
         if self.y_scale == "log":
-            overall_frame = overall_frame[~(overall_frame[ycol] <= 0)]
+            keep &= ~(yvals <= 0)
+        x, y, yrel, xvals, yvals, pair, task = (a[keep] for a in (x, y, yrel, xvals, yvals, pair, task))
 
-        if overall_frame.empty or pd.isnull(overall_frame[xcol]).all() or pd.isnull(overall_frame[ycol]).all():
+        if len(x) == 0 or np.isnan(xvals).all() or np.isnan(yvals).all():
             self.data_view = pn.pane.Markdown("All points have been dropped")
             self.data_view_in_progress = False
             return
 
         # Define axis labels
-        tmp = overall_frame.replace(np.nan, np.Infinity)
-        num_x_lower = get_num_true(tmp['x'] < tmp['y'])
-        num_y_lower = get_num_true(tmp['y'] < tmp['x'])
-        x_failed_table = (tmp['x'] == np.Infinity)
-        y_failed_table = (tmp['y'] == np.Infinity)
-        num_x_failed = get_num_true(x_failed_table)
-        num_y_failed = get_num_true(y_failed_table)
-        num_x_failed_single = get_num_true(x_failed_table & ~y_failed_table)
-        num_y_failed_single = get_num_true(y_failed_table & ~x_failed_table)
+        x_failed_table = np.isnan(x) | (x == np.inf)
+        y_failed_table = np.isnan(y) | (y == np.inf)
+        xinf = np.where(x_failed_table, np.inf, x)
+        yinf = np.where(y_failed_table, np.inf, y)
+        num_x_lower = np.count_nonzero(xinf < yinf)
+        num_y_lower = np.count_nonzero(yinf < xinf)
+        num_x_failed = np.count_nonzero(x_failed_table)
+        num_y_failed = np.count_nonzero(y_failed_table)
+        num_x_failed_single = np.count_nonzero(x_failed_table & ~y_failed_table)
+        num_y_failed_single = np.count_nonzero(y_failed_table & ~x_failed_table)
         xlabel = self.x_attribute + f" (lower: {num_x_lower}, failed: {num_x_failed}, failed single: {num_x_failed_single})"
         ylabel = self.y_attribute + f" (lower: {num_y_lower}, failed: {num_y_failed}, failed single: {num_y_failed_single})"
 
         # Compute min and max values.
-        xmax = overall_frame[xcol].max()
-        xmin = overall_frame[xcol].min()
-        ymax = overall_frame[ycol].max()
-        ymin = overall_frame[ycol].min()
+        xmax = np.nanmax(xvals)
+        xmin = np.nanmin(xvals)
+        ymax = np.nanmax(yvals)
+        ymin = np.nanmin(yvals)
         if (self.x_attribute == self.y_attribute and not self.relative):
             xmax = max(xmax, ymax)
             ymax = xmax
@@ -238,8 +352,13 @@ class Scatterplot(Report):
         # Compute failed values.
         x_failed = int(10 ** math.ceil(math.log10(xmax))) if self.x_scale == "log" else xmax*1.1
         y_failed = int(10 ** math.ceil(math.log10(ymax))) if self.y_scale == "log" else ymax*1.1
-        overall_frame[xcol].replace(np.nan,x_failed, inplace=True)
-        overall_frame[ycol].replace(np.nan,y_failed, inplace=True)
+        x = np.where(np.isnan(x), x_failed, x)
+        if self.relative:
+            yrel = np.where(np.isnan(yrel), y_failed, yrel)
+        else:
+            y = np.where(np.isnan(y), y_failed, y)
+        xcol = 'x'
+        ycol = 'y' if not self.relative else 'yrel'
 
         # Compute ranges if they are not specified.
         if self.autoscale:
@@ -248,12 +367,28 @@ class Scatterplot(Report):
               "y_range" : (ymin*0.9, y_failed*1.1)
             })
 
-        indices = []
+        # Sort the points by group, then by name/domain and problem, such that
+        # every legend group is one contiguous slice.
+        names = [name for _, _, name in algorithm_pairs]
+        task_domains = store.problem_index.codes[0][task]
         if self.group_by == "name":
-            indices = [name for _, _, name in algorithm_pairs]
+            indices = list(dict.fromkeys(names))
+            group = np.array([indices.index(name) for name in names], dtype=int)[pair]
+            order = np.lexsort((pair, task, group))
         else:
-            indices = list(set(overall_frame.index.get_level_values(0)))
-            indices.sort()
+            name_rank = {name : i for i, name in enumerate(sorted(set(names)))}
+            group = task_domains
+            order = np.lexsort((pair, task, np.array([name_rank[name] for name in names], dtype=int)[pair], group))
+        self.plot_pairs = algorithm_pairs
+        self.plot_frame = pd.DataFrame({'x': x[order], 'y': y[order], 'yrel': yrel[order],
+                                        'pair': pair[order], 'task': task[order]})
+        group = group[order]
+        if self.group_by == "domain":
+            groups = np.unique(group)
+            indices = [store.problem_index.levels[0][g] for g in groups]
+        else:
+            groups = np.arange(len(indices))
+        group_offsets = np.searchsorted(group, np.append(groups, groups[-1] + 1 if len(groups) else 0))
 
         # compute appropriate number of columns and height of legend
         indices_length = [len(i) for i in indices]
@@ -269,11 +404,14 @@ class Scatterplot(Report):
                 ncols -= 1
                 break
 
-        plot = figure(width=self.x_size, height=self.y_size + 23*math.ceil(len(indices)/ncols),
+        num_points = len(self.plot_frame.index)
+        binned = num_points > self.binning_threshold
+        plot = figure(width=self.x_size, height=self.y_size + (0 if binned else 23*math.ceil(len(indices)/ncols)),
                       x_axis_label=xlabel, y_axis_label = ylabel,
                       x_axis_type = self.x_scale, y_axis_type = self.y_scale,
                       x_range = self.x_range, y_range = self.y_range,
-                      active_scroll = "wheel_zoom")
+                      active_scroll = "wheel_zoom",
+                      output_backend = "webgl" if num_points > self.webgl_threshold else "canvas")
 
         # helper lines
         plot.renderers.extend([Span(location=x_failed, dimension='height', line_color='red')])
@@ -282,15 +420,24 @@ class Scatterplot(Report):
         max_point = max(self.x_range[1],self.y_range[1])
         plot.line(x=[min_point, max_point], y=[1,1] if self.relative else [min_point, max_point], color='black')
 
+        if binned:
+            self.add_binned_points(plot, self.plot_frame, xcol, ycol)
+            plot.title.text = f"{num_points} points in {SCATTER_BINS}x{SCATTER_BINS} bins"
+            plot.add_tools(TapTool())
+            self.data_view = pn.Column(plot, sizing_mode="fixed", scroll=True)
+            self.data_view_in_progress = False
+            return
+
+        compact = num_points > self.webgl_threshold
         legend_items = []
         for i, index in enumerate(indices):
-            df = overall_frame.loc[[index]].reset_index()
-            p = plot.scatter(x=xcol, y=ycol, source=df,
+            df = self.plot_frame.iloc[group_offsets[i]:group_offsets[i+1]]
+            p = plot.scatter(x=xcol, y=ycol, source=self.get_compact_source(df) if compact else self.describe_points(df),
                 line_color=self.colors[i%len(COLORS)], marker=self.markers[i%len(MARKERS)],
                 fill_color=self.colors[i%len(COLORS)], fill_alpha=self.marker_fill_alpha,
                 size=self.marker_size, muted_fill_alpha = min(0.1,self.marker_fill_alpha))
             p.data_source.selected.on_change('indices', partial(self.on_click_callback, df=df))
-            legend_items.append(LegendItem(label=index, renderers = [plot.renderers[i+3]]))
+            legend_items.append(LegendItem(label=index, renderers = [p]))
 
 
         # legend
@@ -299,11 +446,11 @@ class Scatterplot(Report):
         plot.add_layout(legend, 'below')
         plot.legend.ncols = ncols
 
-        # hover info
-        plot.add_tools(HoverTool(tooltips=[
+        # hover info, compact sources only have the coordinates
+        plot.add_tools(HoverTool(tooltips=([] if compact else [
             ('Domain', '@domain'),
             ('Problem', '@problem'),
-            ('Name', '@name'),
+            ('Name', '@name')]) + [
             ('x', '@x'),
             ('y', '@y'),
             ('yrel', '@yrel'),
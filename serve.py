@@ -0,0 +1,32 @@
+#! /usr/bin/env python3
+
+# Serves the visualizer like "panel serve server.py", but with the chunked
+# upload endpoint for properties files, which panel serve cannot register.
+# Uploads then no longer go through one websocket message.
+#
+#   ./serve.py --port 5006 --allow-websocket-origin example.org:5006
+
+import argparse
+import os
+
+import panel as pn
+
+import upload
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=5006)
+    parser.add_argument("--address", default=None)
+    parser.add_argument("--allow-websocket-origin", dest="websocket_origin", action="append", default=None)
+    args = parser.parse_args()
+
+    upload.enabled = True
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+    pn.serve({"server": app}, port=args.port, address=args.address,
+             websocket_origin=args.websocket_origin, show=False,
+             extra_patterns=upload.upload_routes())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,24 @@
 #! /usr/bin/env python3
 
+import asyncio
 import base64 # for encoding the compressed json parameter dict as url
 from io import BytesIO # for reading in bytestrings from file upload
 import json # for dumping the parameter dict as json
 import logging
+import os
 import param
 import panel as pn
+import threading
 import zlib # for compressing the json parameter dict
+from functools import partial
 
 from absolutetable import AbsoluteTablereport
 from difftable import DiffTablereport
-from experimentdata import ExperimentData
+from experimentcache import ExperimentCache
+from experimentdata import ExperimentData, SessionExperimentData
+from experimentregistry import ExperimentRegistry
+from propertiesloader import LoadCancelled, LoadProgress
+import upload
 from problemtable import ProblemTablereport
 from scatter import Scatterplot
 from wisetable import WiseTablereport
@@ -20,11 +28,36 @@ pn.extension('floatpanel')
 pn.extension('tabulator')
 pn.extension('terminal')
 
+# Parsed properties files are cached on disk across sessions and server restarts.
+experiment_cache = ExperimentCache(
+    os.environ.get("VISUALIZER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "visualizer")),
+    max_size = int(os.environ.get("VISUALIZER_CACHE_SIZE_MB", 2048)) * 2**20,
+    memmap = os.environ.get("VISUALIZER_CACHE_MEMMAP", "1") != "0")
+# Sessions looking at the same properties file share one ExperimentData.
+experiment_registry = ExperimentRegistry(experiment_cache)
+# Whether the wise matrices of newly loaded data are computed in the background.
+warm_wise_matrices = os.environ.get("VISUALIZER_WARM_WISE", "1") != "0"
+
+# Report parameters that are part of the config string in the url.
+REPORT_CONFIG_PARAMS = {
+    "Absolute Report" : ["attributes", "domains", "algorithms", "precision"],
+    "Diff Report" : ["attributes", "domains", "algorithm1", "algorithm2", "percentual", "variants", "precision"],
+    "Problem Report" : ["domain", "problem", "algorithms"],
+    "Scatter Plot" : ["x_attribute", "y_attribute", "entries_list", "relative",
+                      "group_by", "x_scale", "y_scale", "autoscale", "x_range", "y_range",
+                      "replace_zero", "x_size", "y_size", "marker_size", "marker_fill_alpha",
+                      "markers", "colors", "webgl_threshold", "binning_threshold"],
+    "Wise Report" : ["attribute"],
+    "Cactus Plot" : ["attribute", "algorithms", "x_scale", "y_scale", "autoscale",
+                     "x_range", "y_range", "replace_zero", "x_size", "y_size", "colors", "max_steps"],
+}
+
 class ReportViewer(param.Parameterized):
     report_type = param.Selector()
     properties_upload = param.Selector(objects=["file", "url"], default="url")
     properties_url = param.String(default="", label="")
     properties_file = param.FileSelector(precedence=-1)
+    cancel_loading = param.Action(lambda viewer: viewer.cancel_property_file(), label="Cancel loading", precedence=-1)
     custom_min_wins = param.Dict(default={},
         doc="Dictionary mapping (numeric) attributes to True/False, indicating whether a lower value is better or not.")
     custom_aggregators = param.Dict(default={},
@@ -40,79 +73,103 @@ class ReportViewer(param.Parameterized):
         self.setting_param_config = False
         self.setting_params = False
 
-        self.reports = {
-            "Absolute Report" : AbsoluteTablereport(name="Absolute Report"),
-            "Diff Report" : DiffTablereport(name="Diff Report"),
-            "Problem Report" : ProblemTablereport(name="Problem Report"),
-            "Scatter Plot" : Scatterplot(name="Scatter Plot"),
-            "Wise Report": WiseTablereport(name="Wise Report"),
-            "Cactus Plot": Cactusplot(name="Cactus Plot")
+        self.report_classes = {
+            "Absolute Report" : AbsoluteTablereport,
+            "Diff Report" : DiffTablereport,
+            "Problem Report" : ProblemTablereport,
+            "Scatter Plot" : Scatterplot,
+            "Wise Report": WiseTablereport,
+            "Cactus Plot": Cactusplot
         }
+        # Reports and their views are only created when they are first shown,
+        # and are bound to new experiment data when they are shown next.
+        self.reports = dict()
+        self.views = dict()
+        # Reports whose names or attribute customizations changed while they were not shown.
+        self.outdated_reports = set()
+        # Progress of the properties file that is being loaded, None if no
+        # file is loading. Report parameters from the config string are set
+        # once the file is loaded.
+        self.loading = None
+        self.pending_report_params = None
+        self.loaded_url = self.param.properties_url.default
+        self.restoring_url = False
+        # If the upload endpoint is registered, files are uploaded in chunks
+        # to current_upload instead of through properties_file. The last
+        # completed upload is removed once it is replaced, both are removed
+        # with the session, also if it closes mid-upload.
+        self.current_upload = None
+        self.completed_upload = None
+        self.upload_input = None
+        if upload.enabled:
+            pn.state.on_session_destroyed(self.discard_uploads)
+            self.current_upload = upload.create_upload(self)
+            self.upload_input = upload.ChunkedFileInput(upload_id=self.current_upload.id, visible=False, margin=(0,10))
+            self.upload_input.param.watch(self.update_upload, "completed")
+            self.upload_input.param.watch(self.log_upload_progress, ["uploaded", "error"])
 
-        self.param.report_type.objects = [name for name in self.reports.keys()]
+        self.param.report_type.objects = [name for name in self.report_classes.keys()]
         self.report_type = self.param.report_type.objects[0]
         self.previous_report_type = self.report_type
 
-        self.views = dict()
-        for key, r in self.reports.items():
-            self.views[key] = pn.Row(
+        self.experiment_data = SessionExperimentData(ExperimentData())
+        pn.state.on_session_destroyed(self.close)
+        if self.param_config:
+            self.set_from_param_config()
+
+        #register callback for creating config string for url
+        self.param.watch(self.update_param_config,
+            ["properties_upload", "properties_url", "properties_file",
+             "report_type", "custom_min_wins", "custom_aggregators",
+             "custom_algorithm_names"])
+
+
+    # Returns the report with the given name, creating it, binding it to the
+    # current experiment data or redrawing it if necessary.
+    def get_report(self, name):
+        if name not in self.reports:
+            self.reports[name] = self.report_classes[name](self.experiment_data, name=name)
+            self.reports[name].param.watch(self.update_param_config, REPORT_CONFIG_PARAMS[name])
+        elif self.reports[name].experiment_data is not self.experiment_data:
+            self.reports[name].update_experiment_data(self.experiment_data)
+        elif name in self.outdated_reports:
+            if self.reports[name].display_names is not self.experiment_data.display_names:
+                self.reports[name].update_algorithm_names()
+            self.reports[name].view_data()
+        self.outdated_reports.discard(name)
+        logger.debug(f"{name}: {self.experiment_data.views}")
+        return self.reports[name]
+
+
+    def get_view(self, name):
+        report = self.get_report(name)
+        if name not in self.views:
+            self.views[name] = pn.Row(
                 pn.Column(
                     pn.Param(self.param.report_type, margin=(0,10)),
                     pn.Row(
                         pn.pane.HTML("<label>Properties</label>", margin=(10,0,0,20)),
                         pn.widgets.TooltipIcon(margin=(10,0,0,0), value=
-                            "Expects a json file or an archive containing a json "
-                            "file. It can either be uploaded or linked by url. "
+                            "Expects a json file (possibly compressed with gzip, "
+                            "xz or bz2) or a tar or zip archive containing a "
+                            "properties file. It can either be uploaded or linked by url. "
                             "If url is used, you can share your current report "
                             "view by copying the link shown in the browser.")
                     ),
                     pn.Param(self.param.properties_upload, widgets = {'properties_upload': {'widget_type': pn.widgets.RadioBoxGroup, 'inline': True}}, margin=(0,0,-8,10)),
                     pn.Param(self.param.properties_url, margin=(0,10)),
                     pn.Param(self.param.properties_file, widgets = {'properties_file': pn.widgets.FileInput}, margin=(0,10)),
+                    *([self.upload_input] if self.upload_input else []),
+                    pn.Param(self.param.cancel_loading, margin=(0,10)),
                     pn.Param(self.param.custom_min_wins, margin=(0,10)),
                     pn.Param(self.param.custom_aggregators, margin=(0,10)),
                     pn.Param(self.param.custom_algorithm_names, margin=(0,10)),
-                    r.view_param,
+                    report.view_param,
                     width=500,
                     scroll=True),
-                pn.panel(r.view_data, defer_load=True, scroll=True),
+                pn.panel(report.view_data, defer_load=True, scroll=True),
                 sizing_mode='stretch_both')
-
-        if self.param_config:
-            set_from_param_config()
-        else:
-            self.experiment_data = ExperimentData()
-            for r in self.reports.values():
-                r.update_experiment_data(self.experiment_data)
-
-        #register callback for creating config string for url
-        self.param.watch(self.update_param_config,
-            ["properties_upload", "properties_url", "properties_file",
-             "report_type", "custom_min_wins", "custom_aggregators",
-             "custom_algorithm_names"])
-        self.reports["Absolute Report"].param.watch(
-            self.update_param_config,
-            ["attributes", "domains", "algorithms", "precision"])
-        self.reports["Diff Report"].param.watch(
-            self.update_param_config,
-            ["attributes", "domains", "algorithm1", "algorithm2", "percentual",
-             "precision"])
-        self.reports["Problem Report"].param.watch(
-            self.update_param_config,
-            ["domain", "problem", "algorithms"])
-        self.reports["Scatter Plot"].param.watch(
-            self.update_param_config,
-            ["x_attribute", "y_attribute", "entries_list", "relative",
-             "group_by", "x_scale", "y_scale", "autoscale", "x_range", "y_range",
-             "replace_zero", "x_size", "y_size", "marker_size", "marker_fill_alpha",
-             "markers", "colors"])
-        self.reports["Wise Report"].param.watch(
-            self.update_param_config,
-            ["attribute"])
-        self.reports["Cactus Plot"].param.watch(
-            self.update_param_config,
-            ["attribute", "algorithms", "x_scale", "y_scale", "autoscale",
-             "x_range", "y_range", "replace_zero", "x_size", "y_size", "colors"])
+        return self.views[name]
 
     @param.depends('properties_upload', watch=True)
     def update_properties_upload(self):
@@ -122,35 +179,158 @@ class ReportViewer(param.Parameterized):
             self.properties_file = None
         else:
             self.param.properties_url.precedence = -1
-            self.param.properties_file.precedence = None
+            if not self.upload_input:
+                self.param.properties_file.precedence = None
             self.properties_url = ""
+        if self.upload_input:
+            self.upload_input.visible = self.properties_upload == "file"
 
     @param.depends('properties_url', 'properties_file', watch=True)
     def update_property_file(self):
+        if self.restoring_url:
+            return
         if self.properties_upload == "url":
-            self.experiment_data = ExperimentData(self.properties_url)
+            self.start_loading(self.properties_url)
         else:
             print("reading from bytestring")
-            self.experiment_data = ExperimentData(BytesIO(self.properties_file))
-        for r in self.reports.values():
-            r.update_experiment_data(self.experiment_data)
+            self.start_loading(BytesIO(self.properties_file))
+
+
+    def update_upload(self, event):
+        uploaded_file = self.current_upload.complete()
+        if uploaded_file is None:
+            logger.warning("Could not upload the properties file completely.")
+            return
+        if self.completed_upload:
+            upload.discard_upload(self.completed_upload)
+        self.completed_upload = self.current_upload
+        self.current_upload = upload.create_upload(self)
+        self.upload_input.upload_id = self.current_upload.id
+        self.start_loading(uploaded_file)
+
+
+    def log_upload_progress(self, event):
+        if event.name == "error":
+            if event.new:
+                logger.warning(f"Could not upload the properties file: {event.new}")
+            return
+        size = self.upload_input.size
+        if size and event.new * 10 // size != event.old * 10 // size:
+            logger.info(f"Uploaded {event.new / 2**20:.1f} of {size / 2**20:.1f} MB of the properties file...")
+
+
+    def start_loading(self, source):
+        # A new properties file replaces one that is still loading.
+        self.cancel_load()
+        self.loading = LoadProgress()
+        self.param.cancel_loading.precedence = None
+        # Runs on the server's event loop, or right away outside of a server.
+        param.parameterized.async_executor(partial(self.load_property_file, source, self.loading))
+
+
+    # Loads the properties file in a worker thread such that the session
+    # stays responsive, and binds it once it is loaded. The previous
+    # experiment data stays active until then, and if the load is cancelled
+    # or fails.
+    async def load_property_file(self, source, progress):
+        shared_data = None
+        try:
+            shared_data = await asyncio.get_running_loop().run_in_executor(
+                None, experiment_registry.acquire, source, progress)
+        except LoadCancelled:
+            pass
+        except Exception as ex:
+            if not progress.cancelled.is_set():
+                logger.warning(f"Could not load the properties file: {ex}")
+        finally:
+            if self.loading is progress:
+                self.loading = None
+                self.param.cancel_loading.precedence = -1
+        if progress.cancelled.is_set():
+            if shared_data is not None:
+                experiment_registry.release(shared_data)
+            logger.info("Cancelled loading the properties file.")
+            return
+        if shared_data is None:
+            self.pending_report_params = None
+            return
+
+        previous_data = self.experiment_data.shared
+        self.experiment_data = SessionExperimentData(shared_data)
+        experiment_registry.release(previous_data)
+        self.loaded_url = source if isinstance(source, str) and not isinstance(source, upload.UploadedFile) else self.param.properties_url.default
+        self.experiment_data.set_attribute_customizations(self.custom_min_wins, self.custom_aggregators)
+        self.experiment_data.rename_columns(self.custom_algorithm_names)
+        if warm_wise_matrices and shared_data.numeric_attributes:
+            keys = [(a, shared_data.attribute_info[a].default_min_wins) for a in shared_data.numeric_attributes]
+            threading.Thread(target=shared_data.wise_cache.warm, args=(keys,), daemon=True).start()
+        # Only the shown report is bound now, the others when they are shown next.
+        if shared_data.algorithms:
+            logger.info(f"Preparing the {self.report_type}...")
+        report = self.get_report(self.report_type)
+        if self.pending_report_params is not None:
+            params, self.pending_report_params = self.pending_report_params, None
+            self.setting_params = True
+            try:
+                report.set_params_from_dict(params)
+            except Exception as ex:
+                pass
+            self.setting_params = False
+
+
+    def cancel_load(self):
+        if self.loading is None:
+            return
+        self.loading.cancel()
+        self.loading = None
+        self.pending_report_params = None
+        self.param.cancel_loading.precedence = -1
+
+
+    # Cancels loading on request of the user and shows the url of the
+    # experiment data that stays active again.
+    def cancel_property_file(self):
+        if self.loading is None:
+            return
+        logger.info("Cancelling loading the properties file...")
+        self.cancel_load()
+        if self.properties_upload == "url" and self.properties_url != self.loaded_url:
+            self.restoring_url = True
+            self.properties_url = self.loaded_url
+            self.restoring_url = False
+
+
+    def close(self, session_context):
+        self.cancel_load()
+        experiment_registry.release(self.experiment_data.shared)
+
+
+    def discard_uploads(self, session_context):
+        for session_upload in [self.current_upload, self.completed_upload]:
+            if session_upload:
+                upload.discard_upload(session_upload)
+        self.current_upload = self.completed_upload = None
 
 
     @param.depends('custom_min_wins', 'custom_aggregators', 'custom_algorithm_names', watch=True)
     def update_attributes(self):
         self.experiment_data.set_attribute_customizations(
             self.custom_min_wins, self.custom_aggregators)
-        mapping = self.experiment_data.rename_columns(self.custom_algorithm_names)
-        for r in self.reports.values():
-            r.update_algorithm_names(mapping)
-            r.view_data()
+        self.experiment_data.rename_columns(self.custom_algorithm_names)
+        # Only the shown report is redrawn now, the others when they are shown
+        # next. Reports bound to older data are rebound when they are shown.
+        self.outdated_reports.update(name for name, r in self.reports.items()
+                                     if r.experiment_data is self.experiment_data)
+        if self.report_type in self.outdated_reports:
+            self.get_report(self.report_type)
 
 
     def view(self):
-        if (self.previous_report_type != self.report_type):
+        # The previous report may never have been created, e.g. if the config string selected another report.
+        if self.previous_report_type != self.report_type and self.previous_report_type in self.reports:
             self.reports[self.previous_report_type].deactivate()
         self.previous_report_type = self.report_type
-        return self.views[self.report_type]
+        return self.get_view(self.report_type)
 
 
     def update_param_config(self, *events):
@@ -163,10 +343,10 @@ class ReportViewer(param.Parameterized):
             self.param_config = ""
             return
 
-        params = self.reports[self.report_type].get_params_as_dict()
+        params = self.get_report(self.report_type).get_params_as_dict()
         if self.properties_url != self.param.properties_url.default:
             params["properties_url"] = self.properties_url
-        params["report_type"] = sorted(self.reports.keys()).index(self.report_type)
+        params["report_type"] = sorted(self.report_classes.keys()).index(self.report_type)
         params["version"] = "1.0"
         params["custom_min_wins"] = self.custom_min_wins
         params["custom_aggregators"] = self.custom_aggregators
@@ -184,13 +364,16 @@ class ReportViewer(param.Parameterized):
             params = json.loads(zlib.decompress(base64.urlsafe_b64decode(self.param_config.encode())))
             self.param.update({
                 "properties_url": params.pop("properties_url"),
-                "report_type": sorted(self.reports.keys())[int(params.pop("report_type"))],
+                "report_type": sorted(self.report_classes.keys())[int(params.pop("report_type"))],
                 "custom_min_wins": params.pop("custom_min_wins"),
                 "custom_aggregators": params.pop("custom_aggregators"),
                 "custom_algorithm_names": params.pop("custom_algorithm_names"),
             })
             assert(params.pop("version") == "1.0")
-            self.reports[self.report_type].set_params_from_dict(params)
+            if self.loading is not None:
+                self.pending_report_params = params
+            else:
+                self.get_report(self.report_type).set_params_from_dict(params)
         except Exception as ex:
             pass
         self.setting_params = False
@@ -222,3 +405,4 @@ view.servable()
 
 #to enable up to 200MB files, call the server with
 #panel serve server.py --websocket-max-message-size=209715200
+#or serve it with ./serve.py, which uploads files in chunks
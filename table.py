@@ -6,14 +6,13 @@ import param
 import pandas as pd
 from collections import defaultdict
 import panel as pn
-from scipy import stats
 
+from aggregation import DomainPartials
 from experimentdata import ExperimentData
 from problemtable import ProblemTablereport
 from report import Report
 
 # TODO: is replacing 0 with something like 0.0001 a valid approach for gmean?
-# TODO: fix warnings for gmean
 
 class Tablereport(Report):
     attributes = param.ListSelector()
@@ -38,9 +37,24 @@ class Tablereport(Report):
         super().__init__(experiment_data, **params)
 
         self.unfolded = dict() # which attributes/domains for each attribute are unfolded in the table
-        self.computed = dict() # per attribute: used aggregator, are domain aggregatos up to date
-        self.exp_data_dropna = pd.DataFrame() # same as self.experiment_data.data.dropna()
-        self.table = pd.DataFrame() # experiment data with aggregates, should be used as base data
+        self.computed = dict() # per attribute: used aggregator
+        self.aggregation_columns = [] # algorithms that need a value for a problem to be aggregated
+        self.aggregation_positions = [] # positions of aggregation_columns in experiment_data.algorithms
+        self.domain_partials = None # per-domain partial aggregates over aggregation_columns, updated incrementally
+        self.aggregate_rows = np.empty(0, dtype=int) # positions of the attribute aggregate rows in self.table
+        self.domain_aggregate_rows = np.empty((0,0), dtype=int) # positions of the domain aggregate rows in self.table
+        self.table_attributes = dict() # attribute -> block number in self.table (blocks are sorted by attribute)
+        self.attribute_rows = dict() # attribute -> position of its aggregate row in self.table
+        self.domain_rows = np.empty((0,0), dtype=int) # (attribute block, domain) -> position of the domain row
+        self.visible_rows_state = None # fold state for which visible_rows was computed
+        self.visible_rows = (np.empty(0, dtype=int),) * 3
+        self.visible_table = (None, pd.DataFrame()) # (fold state, table version) and the visible rows of the table
+        self.index_widths = dict() # fold state -> width of the Index column
+        self.row_kinds = np.empty(0, dtype=int) # per row in self.table: 0 attribute aggregate, 1 domain aggregate
+        self.style_cache = dict() # (attribute, style key, min_wins) -> (css strings, computed) per problem row of the store
+        self.aggregate_style_cache = dict() # (attribute, style key, min_wins) -> (positions, css strings) of the attribute's aggregate rows
+        self.table = pd.DataFrame() # aggregate rows of all attributes and domains, problem rows are read from the store
+        self.table_version = 0 # changes whenever values of self.table change
         self.previous_precision = -1 # used to find out if we need to reapply formatters
 
         # ajaxLoader false is set to reduce blinking (https://github.com/olifolkerd/tabulator/issues/1027)
@@ -51,7 +65,7 @@ class Tablereport(Report):
             sortable=False, stylesheets=[Tablereport.stylesheet]
         )
         self.data_view.add_filter(self.filter)
-        self.data_view.style.apply(func=self.style_table_by_row, axis=1)
+        self.data_view.style.apply(func=self.style_table, axis=None)
         self.data_view.on_click(self.on_click_callback)
 
         self.param_view = pn.Column(
@@ -67,10 +81,12 @@ class Tablereport(Report):
         param_updates = super().set_experiment_data_dependent_parameters()
 
         # Reset fields.
-        self.exp_data_dropna = self.experiment_data.data.dropna()
+        self.aggregation_columns = []
+        self.aggregation_positions = []
+        self.domain_partials = None
         self.table = pd.DataFrame()
         self.unfolded = dict()
-        self.computed = { attribute : {"aggregator": None, "domains_outdated" : True} for attribute in self.experiment_data.numeric_attributes }
+        self.computed = { attribute : None for attribute in self.experiment_data.numeric_attributes }
         self.computed["__columns"] = []
         self.computed["__domains"] = []
         self.previous_precision = -1
@@ -82,66 +98,246 @@ class Tablereport(Report):
         param_updates["attributes"] =  self.experiment_data.attributes
         param_updates["domains"] = self.experiment_data.domains
 
-        # Build the rows for the aggregated values such that we later just overwrite values rather than concatenate.
+        # Other table reports of the session share the built table, ours gets its own aggregate values.
+        self.table = self.experiment_data.views.get(("table", None), self.build_table).copy()
+
+        # Remember where the aggregate rows are, in the order of numeric_attributes and domain blocks.
+        numeric_attributes = self.experiment_data.numeric_attributes
+        domains = self.experiment_data.data.block_domains
+        self.aggregate_rows = self.table.index.get_indexer([(a, "--", "--") for a in numeric_attributes])
+        self.domain_aggregate_rows = self.table.index.get_indexer(
+            [(a, d, "--") for a in numeric_attributes for d in domains]).reshape(len(numeric_attributes), len(domains))
+
+        # Precompute the row positions of every attribute and domain block.
+        # Every attribute block has one row per domain, sorted like the store.
+        self.visible_rows_state = None
+        self.visible_table = (None, pd.DataFrame())
+        self.index_widths = dict()
+        self.style_cache = dict()
+        self.aggregate_style_cache = dict()
+        self.table_version += 1
+        index = self.table.index
+        # The visible table is indexed by codes into these levels, problem
+        # rows take their domain and problem codes from the store.
+        store_index = self.experiment_data.data.problem_index
+        problem_level = store_index.levels[1].union(["--"])
+        self.visible_levels = [index.levels[0], index.levels[1], problem_level]
+        self.store_codes = (index.levels[1].get_indexer(store_index.levels[0])[store_index.codes[0]],
+                            problem_level.get_indexer(store_index.levels[1])[store_index.codes[1]])
+        if len(index) == 0:
+            self.table_attributes = dict()
+            self.attribute_rows = dict()
+            self.block_codes = np.empty(0, dtype=int)
+            self.domain_rows = np.empty((0,0), dtype=int)
+            self.row_kinds = np.empty(0, dtype=int)
+        else:
+            no_domain = index.codes[1] == index.levels[1].get_loc("--")
+            attribute_rows = np.flatnonzero(no_domain)
+            table_attributes = index.levels[0][index.codes[0][attribute_rows]]
+            self.table_attributes = { a : i for i, a in enumerate(table_attributes) }
+            self.attribute_rows = dict(zip(table_attributes, attribute_rows))
+            self.block_codes = index.codes[0][attribute_rows]
+            self.domain_rows = np.flatnonzero(~no_domain).reshape(len(table_attributes), len(domains))
+            self.row_kinds = np.where(no_domain, 0, 1)
+
+        return param_updates
+
+    # Returns the empty rows for the aggregated values such that we later
+    # just overwrite values. Problem rows are only read from the store when
+    # they are shown, so the table stays small for large experiments.
+    def build_table(self):
         mi = pd.MultiIndex.from_product([self.experiment_data.attributes, ["--", *self.experiment_data.domains], ["--"]],
                                         names = ["attribute", "domain", "problem"])
-        aggregated_data_skeleton = pd.DataFrame(data = "", index = mi, columns = self.experiment_data.algorithms)
-        # Combine experiment data and aggregated data skeleton.
-        self.table = pd.concat([self.experiment_data.data, aggregated_data_skeleton]).sort_index()
+        table = pd.DataFrame(data = "", index = mi, columns = self.experiment_data.algorithms).sort_index()
 
         # Add Index column (solely used in the visualization).
-        pseudoindex = [x[0] if x[1]=="--" else (x[1] if x[2] == "--" else x[2]) for x in self.table.index]
-        self.table.insert(0, "Index", pseudoindex)
+        index = table.index
+        no_domain = index.codes[1] == index.levels[1].get_loc("--")
+        pseudoindex = np.where(no_domain, index.levels[0].to_numpy()[index.codes[0]], index.levels[1].to_numpy()[index.codes[1]])
+        table.insert(0, "Index", pseudoindex)
+        return table
 
-        return param_updates
+    def get_view_table(self):
+        return self.get_visible_table()
 
-    def update_algorithm_names(self, mapping):
-        self.table.rename(columns = mapping, inplace=True)
-        self.computed["__columns"] = [mapping[x] for x in self.computed["__columns"]]
 
-    def get_view_table(self):
-        return self.table
+    # Returns the titles of the view table columns that differ from their names.
+    def get_column_titles(self, columns):
+        return { c : self.display_names[c] for c in columns
+                 if c in self.display_names and self.display_names[c] != c }
 
 
     def get_current_columns(self):
         return self.experiment_data.algorithms
 
 
-    def style_table_by_row(self, row):
+    # Returns the key under which value styles of the current view are cached,
+    # or None if the view has no value styles.
+    def get_style_key(self):
+        return None
+
+
+    # Returns css strings for the given float values of the current columns
+    # (rows x columns of the view table without the Index column).
+    def compute_value_styles(self, attribute, values, min_wins):
+        pass
+
+
+    # Returns the value styles of the given aggregate rows of self.table,
+    # computed once for all aggregate rows of the attribute.
+    def get_aggregate_styles(self, key, block, table_rows):
+        if key not in self.aggregate_style_cache:
+            attribute = key[0]
+            positions = np.sort(np.append(self.domain_rows[block], self.attribute_rows[attribute]))
+            # Only aggregate rows can hold strings, problem rows are read as floats from the store.
+            values = self.table.iloc[positions][self.get_current_columns()].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+            self.aggregate_style_cache[key] = (positions, self.compute_value_styles(attribute, values, key[2]))
+        positions, styles = self.aggregate_style_cache[key]
+        return styles[np.searchsorted(positions, table_rows)]
+
+
+    # Returns the value styles of the given problem rows of the store. They
+    # are computed when a row is shown first and kept until the data, the
+    # style key or the attribute's min_wins change.
+    def get_problem_styles(self, key, store_rows):
+        attribute = key[0]
+        styles, computed = self.style_cache.get(key, (None, np.zeros(len(self.experiment_data.data.problem_index), dtype=bool)))
+        missing = np.unique(store_rows[~computed[store_rows]])
+        if len(missing) > 0:
+            store = self.experiment_data.data
+            positions = [self.experiment_data.algorithms.index(a) for a in self.get_current_columns()]
+            new_styles = self.compute_value_styles(attribute, store.columns[attribute][missing][:, positions], key[2])
+            if styles is None:
+                styles = np.empty((len(computed), new_styles.shape[1]), dtype=object)
+            styles[missing] = new_styles
+            computed[missing] = True
+            self.style_cache[key] = (styles, computed)
+        return styles[store_rows]
+
+
+    def style_table(self, df):
         # Give aggregates a different style, and indent Index col text if it's a domain or problem.
-        style = [""] * len(row)
-        if row.name[1] == "--":
-            style = [x + "font-weight: bold; background-color: #E6E6E6;" for x in style]
-        elif row.name[2] == "--":
-            style = [x + "font-weight: bold; background-color: #F6F6F6;" for x in style]
-            style[0] = style[0] + "text-indent:25px;"
-        else:
-            style[0] = "text-indent:50px;"
-        return style
+        row_styles = np.full((3, len(df.columns)), "", dtype=object)
+        row_styles[0] = "font-weight: bold; background-color: #E6E6E6;"
+        row_styles[1] = "font-weight: bold; background-color: #F6F6F6;"
+        row_styles[1, 0] += "text-indent:25px;"
+        row_styles[2, 0] = "text-indent:50px;"
+        table_rows, store_rows, blocks = self.get_visible_rows()
+        rows = self.get_visible_table().index.get_indexer(df.index)
+        kinds = np.where(table_rows[rows] >= 0, self.row_kinds[table_rows[rows]], 2)
+        styles = row_styles[kinds]
+
+        # Add the value styles of each attribute block, cached per attribute,
+        # style key and min_wins for the rows of self.table and of the store.
+        style_key = self.get_style_key()
+        if style_key is not None and len(rows) > 0:
+            # Styles of other columns are dropped, they are not shown anymore.
+            if any(key[1] != style_key for key in self.style_cache):
+                self.style_cache = {key : styles for key, styles in self.style_cache.items() if key[1] == style_key}
+                self.aggregate_style_cache = {key : styles for key, styles in self.aggregate_style_cache.items() if key[1] == style_key}
+            block_attributes = list(self.table_attributes.keys())
+            for block in np.unique(blocks[rows]):
+                attribute = block_attributes[block]
+                min_wins = self.experiment_data.attribute_info[attribute].min_wins
+                if min_wins is None:
+                    continue
+                key = (attribute, style_key, min_wins)
+                in_block = blocks[rows] == block
+                aggregates = in_block & (table_rows[rows] >= 0)
+                problems = in_block & ~aggregates
+                if aggregates.any():
+                    styles[aggregates, 1:] += self.get_aggregate_styles(key, block, table_rows[rows[aggregates]])
+                if problems.any():
+                    styles[problems, 1:] += self.get_problem_styles(key, store_rows[rows[problems]])
+        return pd.DataFrame(styles, index=df.index, columns=df.columns)
+
+
+    # Returns the currently visible rows in table order as (positions in
+    # self.table, rows in the store, attribute block) per row. Aggregate rows
+    # have store row -1, problem rows have position -1. They are only
+    # recomputed when the fold state or the selection changes.
+    def get_visible_rows(self):
+        fold_state = (tuple(self.attributes), tuple(self.domains),
+                      tuple((a, tuple(doms)) for a, doms in self.unfolded.items()))
+        if fold_state == self.visible_rows_state:
+            return self.visible_rows
+
+        domains = self.experiment_data.data.block_domains
+        selected_domains = set(self.domains)
+        domain_positions = [j for j, d in enumerate(domains) if d in selected_domains]
+        offsets = np.append(self.experiment_data.data.domain_offsets, len(self.experiment_data.data.problem_index))
+        selected_attributes = set(self.attributes)
+        parts = [] # (positions in self.table, rows in the store, attribute block)
+        for a, i in self.table_attributes.items():
+            if a not in selected_attributes:
+                continue
+            parts.append(([self.attribute_rows[a]], [-1], i))
+            if a not in self.unfolded:
+                continue
+            unfolded = set(self.unfolded[a])
+            for j in domain_positions:
+                parts.append(([self.domain_rows[i, j]], [-1], i))
+                if domains[j] in unfolded:
+                    problems = np.arange(offsets[j], offsets[j+1])
+                    parts.append((np.full(len(problems), -1), problems, i))
+        table_rows = np.concatenate([np.asarray(p[0], dtype=int) for p in parts]) if parts else np.empty(0, dtype=int)
+        store_rows = np.concatenate([np.asarray(p[1], dtype=int) for p in parts]) if parts else np.empty(0, dtype=int)
+        blocks = np.repeat([p[2] for p in parts], [len(p[1]) for p in parts]).astype(int)
+        self.visible_rows = (table_rows, store_rows, blocks)
+        self.visible_rows_state = fold_state
+        return self.visible_rows
+
+
+    # Returns the visible rows of the table with the Index column and one
+    # column per algorithm. Aggregate rows are taken from self.table, problem
+    # rows are read from the store attribute by attribute.
+    def get_visible_table(self):
+        table_rows, store_rows, blocks = self.get_visible_rows()
+        key = (self.visible_rows_state, self.table_version)
+        if self.visible_table[0] == key:
+            return self.visible_table[1]
+
+        store = self.experiment_data.data
+        block_attributes = list(self.table_attributes.keys())
+        domain_codes, problem_codes = self.store_codes
+        values = np.empty((len(table_rows), len(self.table.columns)), dtype=object)
+        codes = np.empty((3, len(table_rows)), dtype=np.int64)
+        aggregates = table_rows >= 0
+        values[aggregates] = self.table.to_numpy()[table_rows[aggregates]]
+        codes[0, aggregates] = self.table.index.codes[0][table_rows[aggregates]]
+        codes[1, aggregates] = self.table.index.codes[1][table_rows[aggregates]]
+        codes[2, aggregates] = self.visible_levels[2].get_loc("--")
+        for block in np.unique(blocks[~aggregates]):
+            rows = np.flatnonzero(~aggregates & (blocks == block))
+            problems = store_rows[rows]
+            values[rows, 1:] = store.columns[block_attributes[block]][problems]
+            codes[0, rows] = self.block_codes[block]
+            codes[1, rows] = domain_codes[problems]
+            codes[2, rows] = problem_codes[problems]
+            values[rows, 0] = self.visible_levels[2].to_numpy()[codes[2, rows]]
+
+        visible_table = pd.DataFrame(values, columns=self.table.columns, index=pd.MultiIndex(
+            levels=self.visible_levels, codes=list(codes), names=self.table.index.names))
+        self.visible_table = (key, visible_table)
+        return visible_table
 
 
     def filter(self, df):
         if df.empty:
             return df
 
-        indices = [(a,"--","--") for a in self.attributes]
-        for a, doms in self.unfolded.items():
-            if a not in self.attributes:
-                continue
-            indices += [(a,d,"--") for d in self.domains]
-            for d in doms:
-                if d not in self.domains:
-                    continue
-                indices += [(a,d,p) for p in self.experiment_data.problems[d]]
-        indices.sort()
-        max_length = max([len(x) for x in df.loc[indices]['Index']])
-        self.data_view.widths = {'Index': 10+max_length*7}
-        return df.loc[indices]
+        width = self.index_widths.get(self.visible_rows_state)
+        if width is None:
+            max_length = self.get_visible_table()["Index"].str.len().max()
+            width = self.index_widths[self.visible_rows_state] = 10+max_length*7
+        if self.data_view.widths != {'Index': width}:
+            self.data_view.widths = {'Index': width}
+        # The view table only holds the visible rows.
+        return df
 
 
     def on_click_callback(self, e):
-        row = self.table.iloc[e.row]
-        attribute, domain, problem = row.name[0:3]
+        attribute, domain, problem = self.data_view.value.index[e.row][0:3]
 
         # clicked on concrete problem -> open problem wise report
         if problem != "--":
@@ -168,8 +364,6 @@ class Tablereport(Report):
                 self.unfolded.pop(attribute)
             else:
                 self.unfolded[attribute] = []
-                if attribute in self.experiment_data.numeric_attributes:
-                    self.aggregate_domains_for_attribute(attribute)
 
         self.view_data()
         # Setting the selection makes the redrawn table jump to that row.
@@ -185,71 +379,63 @@ class Tablereport(Report):
         self.computed["__columns"] = current_columns
         self.computed["__domains"] = self.domains
 
-        # If the columns used for aggregation are outdated, recompute dropna to only consider current columns.
+        # Update the per-domain partials incrementally with the changed columns and domains.
+        numeric_attributes = self.experiment_data.numeric_attributes
+        domains = self.experiment_data.data.block_domains
         if columns_outdated:
             unique_columns = list(dict.fromkeys(current_columns))
             if not unique_columns:
                 return
-            self.exp_data_dropna = self.experiment_data.data[unique_columns].dropna()
-
-        cols_without_index = self.table.columns[1:]
-        for attribute in self.experiment_data.numeric_attributes:
-            aggregator = self.experiment_data.attribute_info[attribute].aggregator
-            if not columns_outdated and not domains_outdated and aggregator == self.computed[attribute]["aggregator"]:
-                continue
-            self.computed[attribute]["aggregator"] = aggregator
-
-            # Compute the overall aggregate.
-            attribute_data = None
-            index_string = f"{attribute} ({aggregator}, "
-            num_problems = 0
-            if attribute not in self.exp_data_dropna.index:
-                new_aggregates = np.NaN
+            self.aggregation_columns = unique_columns
+            self.aggregation_positions = [self.experiment_data.algorithms.index(x) for x in unique_columns]
+            if self.domain_partials is None:
+                self.domain_partials = DomainPartials(self.experiment_data.data, numeric_attributes,
+                    self.aggregation_positions, np.isin(domains, self.domains))
             else:
-                attribute_data = self.exp_data_dropna.loc[attribute]
-                attribute_data = attribute_data.loc[attribute_data.index.get_level_values('domain').isin(self.domains)]
-                attribute_data = attribute_data.apply(pd.to_numeric, errors='coerce')
-                num_problems = len(attribute_data.index)
-                # Since gmean is not a built-in function we need to set the variable to the actual function here.
-                if aggregator == "gmean":
-                    aggregator = stats.gmean
-                    attribute_data = attribute_data.replace(0,0.000001)
-                new_aggregates = attribute_data.agg(aggregator)
-            self.table.loc[(attribute, "--", "--"),cols_without_index] = new_aggregates
-
-            self.table.loc[(attribute, "--", "--"),"Index"] = index_string + f"{num_problems}/{self.experiment_data.num_problems})"
-
-            self.computed[attribute]["domains_outdated"] = True
-            if attribute in self.unfolded:
-                self.aggregate_domains_for_attribute(attribute, attribute_data)
-
-
-    def aggregate_domains_for_attribute(self, attribute, attribute_data = None):
-        # Represents the slice of all domain aggregate rows, but without the Index column.
-        rows, cols = (attribute, slice(self.experiment_data.domains[0], self.experiment_data.domains[-1]), "--"), self.table.columns[1:]
-        # This can happen if there are no problems where all columns have a value for the attribute.
-        if attribute not in self.exp_data_dropna.index:
-            self.table.loc[rows,cols] = np.NaN
+                self.domain_partials.set_algorithms(self.aggregation_positions)
+        if self.domain_partials is None:
             return
-
-        if attribute_data is None:
-            attribute_data = self.exp_data_dropna.loc[attribute].apply(pd.to_numeric, errors='coerce')
-        aggregator = self.experiment_data.attribute_info[attribute].aggregator
-        # Since gmean is not a built-in function we need to set the variable to the actual function here.
-        if aggregator == "gmean":
-                aggregator = stats.gmean
-                attribute_data.replace(0,0.000001, inplace=True)
-
-        # Clear the slice and apply combine_first (this way, the newly aggregated data is taken wherever it exists).
-        self.table.loc[rows,cols] = np.NaN
-        self.table.loc[rows,cols] = self.table.loc[rows,cols].combine_first(attribute_data.groupby(level=0).agg(aggregator))
-
-        for domain in self.experiment_data.domains:
-            num_problems = len(self.experiment_data.problems[domain])
-            num_aggregated = 0 if domain not in attribute_data.index.get_level_values(0) else len(attribute_data.loc[domain].index)
-            self.table.loc[(attribute, domain, "--"),'Index'] = f"{domain} ({num_aggregated}/{num_problems})"
-
-        self.computed[attribute]["domains_outdated"] = False
+        if domains_outdated:
+            self.domain_partials.set_domains(np.isin(domains, self.domains))
+
+        aggregators = [self.experiment_data.attribute_info[a].aggregator for a in numeric_attributes]
+        # Domain aggregates do not depend on the domain selection.
+        domains_changed = [i for i, attribute in enumerate(numeric_attributes)
+                           if columns_outdated or aggregators[i] != self.computed[attribute]]
+        overall_changed = list(range(len(numeric_attributes))) if domains_outdated else domains_changed
+        for i in overall_changed:
+            self.computed[numeric_attributes[i]] = aggregators[i]
+
+        positions = self.aggregation_positions
+        if overall_changed or domains_changed:
+            self.index_widths = dict()
+            self.table_version += 1
+            changed = {numeric_attributes[i] for i in overall_changed + domains_changed}
+            # Only the styles of the aggregate rows depend on the aggregated values.
+            self.aggregate_style_cache = {key : styles for key, styles in self.aggregate_style_cache.items() if key[0] not in changed}
+        if overall_changed:
+            overall, counts = self.domain_partials.aggregate()
+            values = np.full((len(overall_changed), len(self.table.columns) - 1), np.NaN)
+            for row, i in enumerate(overall_changed):
+                if aggregators[i] in overall:
+                    values[row, positions] = overall[aggregators[i]][i, positions]
+                else:
+                    self.logger.warning(f"Unknown aggregator {aggregators[i]} for {numeric_attributes[i]}.")
+            self.table.iloc[self.aggregate_rows[overall_changed], 1:] = values
+            self.table.iloc[self.aggregate_rows[overall_changed], 0] = [
+                f"{numeric_attributes[i]} ({aggregators[i]}, {counts[i]}/{self.experiment_data.num_problems})"
+                for i in overall_changed]
+
+        if domains_changed:
+            per_domain, domain_counts = self.domain_partials.aggregate_domains()
+            values = np.full((len(domains_changed), len(domains), len(self.table.columns) - 1), np.NaN)
+            for row, i in enumerate(domains_changed):
+                if aggregators[i] in per_domain:
+                    values[row][:, positions] = per_domain[aggregators[i]][i][:, positions]
+            self.table.iloc[self.domain_aggregate_rows[domains_changed].ravel(), 1:] = values.reshape(-1, values.shape[2])
+            self.table.iloc[self.domain_aggregate_rows[domains_changed].ravel(), 0] = [
+                f"{domain} ({domain_counts[i][j]}/{len(self.experiment_data.problems[domain])})"
+                for i in domains_changed for j, domain in enumerate(domains)]
 
 
     def update_data_view(self):
@@ -275,6 +461,9 @@ class Tablereport(Report):
             """
             self.data_view.formatters = {x: HTMLTemplateFormatter(template=template) for x in new_table.columns}
 
+        titles = self.get_column_titles(new_table.columns)
+        if self.data_view.titles != titles:
+            self.data_view.titles = titles
         self.data_view.value = new_table
 
 
@@ -0,0 +1,72 @@
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+# server.py is a panel app that serves a viewer when it is imported, the
+# module is built from everything before that.
+@pytest.fixture(scope="session")
+def server(tmp_path_factory):
+    os.environ["VISUALIZER_CACHE_DIR"] = str(tmp_path_factory.mktemp("cache"))
+    os.environ["VISUALIZER_WARM_WISE"] = "0"
+    with open(os.path.join(ROOT, "server.py")) as f:
+        source = f.read()
+    module = types.ModuleType("server")
+    module.__file__ = os.path.join(ROOT, "server.py")
+    exec(compile(source[:source.index("viewer = ReportViewer()")], module.__file__, "exec"), module.__dict__)
+    return module
+
+
+def write_properties(path, num_domains=2, num_problems=3, algorithms=("alg1", "alg2")):
+    runs = dict()
+    for d in range(num_domains):
+        for p in range(num_problems):
+            for a, algorithm in enumerate(algorithms):
+                runs[f"{algorithm}-domain{d}-p{p}"] = {
+                    "algorithm": algorithm, "domain": f"domain{d}", "problem": f"p{p}.pddl",
+                    "coverage": 1, "cost": 10 + p + a, "expansions": 100 * (p + 1) + a,
+                }
+    with open(path, "w") as f:
+        json.dump(runs, f)
+    return str(path)
+
+
+@pytest.fixture
+def properties_file(tmp_path):
+    return write_properties(tmp_path / "properties.json")
+
+
+# Serves the files of a directory, sleeping delay seconds per chunk such that
+# loads can be observed and cancelled while they download.
+class ThrottledHandler(SimpleHTTPRequestHandler):
+    chunk_size = 1024
+
+    def copyfile(self, source, destination):
+        while chunk := source.read(self.chunk_size):
+            time.sleep(self.server.delay)
+            destination.write(chunk)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server(tmp_path):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(ThrottledHandler, directory=str(tmp_path)))
+    httpd.delay = 0
+    httpd.url = lambda path: f"http://127.0.0.1:{httpd.server_port}/{os.path.relpath(path, tmp_path)}"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
@@ -0,0 +1,43 @@
+import json
+
+import numpy as np
+
+from aggregation import DomainPartials
+from experimentdata import ExperimentData
+
+
+def assert_same_aggregates(partials, fresh):
+    for (aggregates, counts), (expected, expected_counts) in [(partials.aggregate(), fresh.aggregate()),
+                                                              (partials.aggregate_domains(), fresh.aggregate_domains())]:
+        np.testing.assert_array_equal(counts, expected_counts)
+        for aggregator, values in expected.items():
+            np.testing.assert_allclose(aggregates[aggregator], values, equal_nan=True)
+
+
+# An infinite value that is removed again must not leave NaN behind.
+def test_removing_infinite_values(tmp_path):
+    runs = dict()
+    for d in range(3):
+        for p in range(2):
+            for a, algorithm in enumerate(["a", "b", "c"]):
+                run = {"algorithm": algorithm, "domain": f"d{d}", "problem": f"p{p}", "time": 1.0 + p + a}
+                if (d, p, algorithm) == (0, 0, "a"):
+                    run["time"] = float("inf")
+                if (d, p, algorithm) == (0, 0, "c"):
+                    del run["time"]
+                runs[f"{algorithm}-{d}-{p}"] = run
+    path = tmp_path / "properties.json"
+    path.write_text(json.dumps(runs))
+    store = ExperimentData(str(path)).data
+    all_domains = np.ones(3, dtype=bool)
+
+    partials = DomainPartials(store, ["time"], [0, 1], all_domains)
+    assert np.isinf(partials.aggregate()[0]["sum"][0, 0])
+    # Selecting c removes the problem with the infinite value, deselecting it adds it again.
+    for positions in [[0, 1, 2], [0, 1]]:
+        partials.set_algorithms(positions)
+        assert_same_aggregates(partials, DomainPartials(store, ["time"], positions, all_domains))
+
+    for domains in [[False, True, True], [True, True, True], [True, False, True]]:
+        partials.set_domains(domains)
+        assert_same_aggregates(partials, DomainPartials(store, ["time"], [0, 1], domains))
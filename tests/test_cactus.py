@@ -0,0 +1,29 @@
+from bokeh.models import HoverTool
+
+from cactus import Cactusplot
+from experimentdata import ExperimentData, SessionExperimentData
+
+
+def test_one_hover_tool_for_all_curves(properties_file):
+    data = SessionExperimentData(ExperimentData(properties_file))
+    data.rename_columns({"alg2": "renamed"})
+    cactus = Cactusplot(data, {"attribute": "expansions"})
+    for _ in range(2):
+        cactus.update_data_view()
+        plot = cactus.data_view[0].object
+        hover_tools = [t for t in plot.tools if isinstance(t, HoverTool)]
+        assert len(hover_tools) == 1
+        assert len(hover_tools[0].renderers) == 2
+        assert ("algorithm", "@algorithm") in hover_tools[0].tooltips
+        assert [r.data_source.data["algorithm"][0] for r in hover_tools[0].renderers] == ["alg1", "renamed"]
+
+
+def test_toggling_algorithms_keeps_one_hover_tool(properties_file):
+    cactus = Cactusplot(SessionExperimentData(ExperimentData(properties_file)), {"attribute": "expansions"})
+    for algorithms in [["alg1"], ["alg1", "alg2"], ["alg2"], ["alg1", "alg2"]]:
+        cactus.algorithms = algorithms
+        cactus.update_data_view()
+        plot = cactus.data_view[0].object
+        hover_tools = [t for t in plot.tools if isinstance(t, HoverTool)]
+        assert len(hover_tools) == 1
+        assert len(hover_tools[0].renderers) == len(algorithms)
@@ -0,0 +1,46 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from experimentcache import STALE_TMP_SECONDS, EncodedColumn, ExperimentCache
+from propertiesloader import load_properties
+
+
+def test_encoded_column():
+    column = EncodedColumn(np.array([[0, -1], [1, 0]], dtype=np.int32), ["a", "b"])
+    assert column[1, 0] == "b"
+    assert np.isnan(column[0, 1])
+    values = np.asarray(column)
+    assert values.dtype == object and values[0, 0] == "a"
+    assert column.__array__(copy=True)[1, 1] == "a"
+    with pytest.raises(ValueError):
+        column.__array__(copy=False)
+
+
+def test_store_and_load(tmp_path, properties_file):
+    cache = ExperimentCache(str(tmp_path / "cache"))
+    key = cache.key(properties_file)
+    properties = load_properties(properties_file)
+    cache.store(key, properties, {a : (True, "sum") for a in properties.attributes})
+    loaded, attribute_defaults = cache.load(key)
+    assert isinstance(loaded.columns["cost"], np.memmap)
+    np.testing.assert_array_equal(loaded.columns["cost"], properties.columns["cost"])
+    assert loaded.problem_index.equals(properties.problem_index)
+    assert attribute_defaults["cost"] == (True, "sum")
+
+
+def test_evict_removes_stale_temporary_entries(tmp_path):
+    cache = ExperimentCache(str(tmp_path))
+    stale = tmp_path / "stale.tmp"
+    fresh = tmp_path / "fresh.tmp"
+    for path in [stale, fresh]:
+        path.mkdir()
+        (path / "column-0.npy").write_bytes(b"0")
+    old = time.time() - STALE_TMP_SECONDS - 60
+    os.utime(stale / "column-0.npy", (old, old))
+    os.utime(stale, (old, old))
+    cache.evict()
+    assert not stale.exists()
+    assert fresh.exists()
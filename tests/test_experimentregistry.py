@@ -0,0 +1,69 @@
+import logging
+
+import pytest
+
+from experimentcache import ExperimentCache
+import experimentregistry
+from experimentregistry import ExperimentRegistry
+from conftest import ThrottledHandler, write_properties
+
+
+def test_missing_file_gives_empty_data(tmp_path, caplog):
+    cache = ExperimentCache(str(tmp_path / "cache"))
+    registry = ExperimentRegistry(cache)
+    path = str(tmp_path / "nonexistent_file.json")
+    assert cache.key(path) is None
+    assert registry.key(path) == path
+
+    with caplog.at_level(logging.WARNING, logger="visualizer"):
+        experiment_data = registry.acquire(path)
+    assert experiment_data.algorithms == []
+    assert "Could not read properties file." in caplog.text
+    # Failed loads are not shared, the next session retries.
+    assert registry.entries == dict()
+
+
+def test_sessions_share_loaded_data(tmp_path, properties_file):
+    registry = ExperimentRegistry(ExperimentCache(str(tmp_path / "cache")))
+    first = registry.acquire(properties_file)
+    second = registry.acquire(properties_file)
+    assert first is second
+    assert first.algorithms == ["alg1", "alg2"]
+    registry.release(first)
+    registry.release(second)
+    assert registry.entries == dict()
+
+
+def test_url_is_keyed_once_per_load(tmp_path, http_server, monkeypatch):
+    heads = []
+    do_head = ThrottledHandler.do_HEAD
+    monkeypatch.setattr(ThrottledHandler, "do_HEAD", lambda handler: heads.append(handler.path) or do_head(handler))
+    url = http_server.url(write_properties(tmp_path / "properties.json"))
+    cache = ExperimentCache(str(tmp_path / "cache"))
+    registry = ExperimentRegistry(cache)
+    experiment_data = registry.acquire(url)
+    assert experiment_data.algorithms == ["alg1", "alg2"]
+    assert len(heads) == 1
+    # The load was stored under the key the registry computed.
+    assert cache.load(registry.cache_key(url)) is not None
+
+
+# Without validators the content of a url may change between sessions.
+def test_unidentified_urls_are_not_shared(tmp_path, http_server):
+    url = http_server.url(write_properties(tmp_path / "properties.json"))
+    registry = ExperimentRegistry()
+    assert registry.key(url) is None
+    first = registry.acquire(url)
+    second = registry.acquire(url)
+    assert first is not second
+    assert registry.entries == dict()
+
+
+def test_failed_load_is_unregistered(tmp_path, properties_file, monkeypatch):
+    def fail(*args, **kwargs):
+        raise MemoryError()
+    monkeypatch.setattr(experimentregistry, "ExperimentData", fail)
+    registry = ExperimentRegistry(ExperimentCache(str(tmp_path / "cache")))
+    with pytest.raises(MemoryError):
+        registry.acquire(properties_file)
+    assert registry.entries == dict()
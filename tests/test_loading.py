@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import threading
+import time
+
+from conftest import write_properties
+
+
+def test_load_reports_progress(server, http_server, tmp_path, caplog):
+    url = http_server.url(write_properties(tmp_path / "properties.json"))
+    viewer = server.ReportViewer()
+    with caplog.at_level(logging.INFO, logger="visualizer"):
+        # Outside of a server, the load runs right away.
+        viewer.properties_url = url
+    assert viewer.experiment_data.algorithms == ["alg1", "alg2"]
+    assert viewer.loading is None
+    assert viewer.param.cancel_loading.precedence == -1
+    messages = [r.getMessage() for r in caplog.records]
+    for message in ["Downloading and parsing the properties file...", "Parsed 12 runs, building the attribute matrices...",
+                    "Computing ipc scores...", "Preparing the Absolute Report..."]:
+        assert message in messages
+    assert any(m.startswith("Read ") and m.endswith("MB of the properties file...") for m in messages)
+    server.experiment_registry.release(viewer.experiment_data.shared)
+
+
+def test_cancel_loading(server, http_server, tmp_path, caplog):
+    url = http_server.url(write_properties(tmp_path / "properties.json", num_problems=200))
+    http_server.delay = 0.02
+    viewer = server.ReportViewer()
+    previous_data = viewer.experiment_data
+    progress = viewer.loading = server.LoadProgress()
+    viewer.param.cancel_loading.precedence = None
+    viewer.properties_url = ""
+
+    with caplog.at_level(logging.INFO, logger="visualizer"):
+        thread = threading.Thread(target=asyncio.run, args=(viewer.load_property_file(url, progress),))
+        thread.start()
+        deadline = time.monotonic() + 10
+        while progress.bytes_read == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert progress.bytes_read > 0
+        viewer.cancel_property_file()
+        thread.join(10)
+
+    assert not thread.is_alive()
+    assert progress.cancelled.is_set()
+    assert viewer.loading is None
+    assert viewer.param.cancel_loading.precedence == -1
+    assert viewer.experiment_data is previous_data
+    assert "Cancelled loading the properties file." in caplog.text
+    assert server.experiment_registry.entries == dict()
+
+
+def test_failed_load_resets_loading(server, monkeypatch, caplog):
+    def fail(source, progress):
+        raise RuntimeError("connection reset")
+    monkeypatch.setattr(server.experiment_registry, "acquire", fail)
+    viewer = server.ReportViewer()
+    previous_data = viewer.experiment_data
+    with caplog.at_level(logging.WARNING, logger="visualizer"):
+        viewer.properties_url = "http://127.0.0.1:1/properties.json"
+    assert viewer.loading is None
+    assert viewer.param.cancel_loading.precedence == -1
+    assert viewer.experiment_data is previous_data
+    assert "Could not load the properties file: connection reset" in caplog.text
@@ -0,0 +1,77 @@
+from array import array
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+from benchmark import load_legacy
+from propertiesloader import CODE_DTYPE, CODE_TYPECODE, load_properties
+
+
+def test_load_properties(properties_file):
+    properties = load_properties(properties_file)
+    assert properties.algorithms == ["alg1", "alg2"]
+    assert properties.domains == ["domain0", "domain1"]
+    assert properties.problems == {d: ["p0.pddl", "p1.pddl", "p2.pddl"] for d in ["domain0", "domain1"]}
+    assert list(properties.problem_index[:2]) == [("domain0", "p0.pddl"), ("domain0", "p1.pddl")]
+    assert properties.numeric_attributes == ["coverage", "cost", "expansions"]
+    np.testing.assert_array_equal(properties.columns["cost"][:3], [[10, 11], [11, 12], [12, 13]])
+
+
+def test_last_run_wins_and_missing_values():
+    runs = {
+        "1": {"algorithm": "b", "domain": "d", "problem": "p2", "cost": 1},
+        "2": {"algorithm": "a", "domain": "d", "problem": "p1", "cost": 2, "error": "none"},
+        "3": {"algorithm": "b", "domain": "d", "problem": "p2", "cost": 3},
+    }
+    properties = load_properties(io.BytesIO(json.dumps(runs).encode()))
+    assert properties.algorithms == ["b", "a"]
+    assert list(properties.problem_index) == [("d", "p1"), ("d", "p2")]
+    np.testing.assert_array_equal(properties.columns["cost"], [[np.nan, 2], [3, np.nan]])
+    assert properties.columns["error"][0, 1] == "none"
+    assert np.isnan(properties.columns["error"][0, 0])
+
+
+def test_boolean_attributes_are_not_numeric():
+    runs = {
+        "1": {"algorithm": "a", "domain": "d", "problem": "p1", "cost": 1, "solved": True},
+        "2": {"algorithm": "a", "domain": "d", "problem": "p2", "cost": 2, "solved": False},
+    }
+    properties = load_properties(io.BytesIO(json.dumps(runs).encode()))
+    assert properties.numeric_attributes == ["cost"]
+    assert properties.columns["solved"][:, 0].tolist() == [True, False]
+
+
+def test_empty_properties():
+    properties = load_properties(io.BytesIO(b"{}"))
+    assert properties.algorithms == []
+    assert len(properties.problem_index) == 0
+
+
+def test_codes_are_64_bit():
+    assert array(CODE_TYPECODE).itemsize == np.dtype(CODE_DTYPE).itemsize == 8
+
+
+# Numeric, mixed and string attributes with missing values and nulls parse
+# like the pandas pivot that ExperimentData used before the streaming loader.
+def test_matches_legacy_loader(tmp_path):
+    runs = dict()
+    for d in range(2):
+        for p in range(3):
+            for a, algorithm in enumerate(["zeta", "alpha", "mid"]):
+                run = {"algorithm": algorithm, "domain": f"domain{d}", "problem": f"p{p}.pddl"}
+                if (d + p + a) % 4:
+                    run["cost"] = 10 * p + a
+                run["score"] = None if a == 1 else 0.5 * (p + d)
+                run["mixed"] = "unsolvable" if p == 2 and a == 0 else p
+                if a != 2:
+                    run["error"] = f"error{p % 2}"
+                runs[f"{algorithm}-{d}-{p}"] = run
+    path = tmp_path / "properties.json"
+    path.write_text(json.dumps(runs))
+
+    frame = load_properties(str(path)).to_frame()
+    legacy = load_legacy(str(path))
+    assert sorted(frame.columns) == sorted(legacy.columns)
+    pd.testing.assert_frame_equal(frame, legacy[frame.columns], check_dtype=False, check_names=False)
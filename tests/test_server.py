@@ -0,0 +1,77 @@
+import base64
+import json
+import os
+import zlib
+
+from bokeh.document import Document
+
+
+def config_string(server, report_type, properties_url="", custom_algorithm_names={}, **params):
+    params |= {
+        "properties_url": properties_url,
+        "report_type": sorted(server.REPORT_CONFIG_PARAMS.keys()).index(report_type),
+        "version": "1.0",
+        "custom_min_wins": {},
+        "custom_aggregators": {},
+        "custom_algorithm_names": custom_algorithm_names,
+    }
+    return base64.urlsafe_b64encode(zlib.compress(json.dumps(params).encode())).decode()
+
+
+def test_open_non_default_report_from_config(server):
+    viewer = server.ReportViewer()
+    viewer.param_config = config_string(server, "Scatter Plot")
+    assert viewer.report_type == "Scatter Plot"
+    viewer.view()
+    assert list(viewer.reports.keys()) == ["Scatter Plot"]
+
+
+def test_open_report_from_config_with_properties(server, properties_file):
+    viewer = server.ReportViewer()
+    viewer.param_config = config_string(server, "Cactus Plot", properties_file, attribute="expansions")
+    viewer.view()
+    report = viewer.reports["Cactus Plot"]
+    assert report.experiment_data.algorithms == ["alg1", "alg2"]
+    assert report.attribute == "expansions"
+
+
+# Configurations saved while custom names relabeled the data refer to the
+# algorithms by their custom names.
+def test_open_report_from_config_with_custom_algorithm_names(server, properties_file):
+    names = { "alg1" : "first", "alg2" : "second" }
+    viewer = server.ReportViewer()
+    viewer.param_config = config_string(server, "Diff Report", properties_file, names,
+                                        algorithm1="second", algorithm2="first")
+    viewer.view()
+    report = viewer.reports["Diff Report"]
+    assert (report.algorithm1, report.algorithm2) == ("alg2", "alg1")
+
+    viewer = server.ReportViewer()
+    viewer.param_config = config_string(server, "Cactus Plot", properties_file, names,
+                                        attribute="expansions", algorithms=["second"])
+    viewer.view()
+    assert viewer.reports["Cactus Plot"].algorithms == ["alg2"]
+
+
+def test_switch_report_type_before_report_exists(server):
+    viewer = server.ReportViewer()
+    viewer.report_type = "Wise Report"
+    viewer.view()
+    viewer.report_type = "Cactus Plot"
+    viewer.view()
+    assert sorted(viewer.reports.keys()) == ["Cactus Plot", "Wise Report"]
+
+
+def test_uploads_are_removed_with_the_session(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(server.upload, "enabled", True)
+    monkeypatch.setattr(server.upload, "UPLOAD_DIR", str(tmp_path))
+    document = Document()
+    monkeypatch.setattr(server.pn.state, "curdoc", document)
+    viewer = server.ReportViewer()
+    session_upload = viewer.current_upload
+    chunk = session_upload.start_chunk(0, 6, 3)
+    session_upload.write(chunk, b"abc")
+    for callback in document.session_destroyed_callbacks:
+        callback(None)
+    assert not os.path.exists(session_upload.path)
+    assert session_upload.id not in server.upload.uploads
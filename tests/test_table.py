@@ -0,0 +1,36 @@
+from absolutetable import AbsoluteTablereport
+from experimentdata import ExperimentData, SessionExperimentData
+
+
+def unfold_all(report):
+    report.unfolded = { a : list(report.domains) for a in report.experiment_data.numeric_attributes }
+
+
+def test_styles_are_kept_across_folding(properties_file, monkeypatch):
+    report = AbsoluteTablereport(SessionExperimentData(ExperimentData(properties_file)))
+    report.aggregate_where_necessary()
+    styled_rows = []
+    compute_value_styles = report.compute_value_styles
+    monkeypatch.setattr(report, "compute_value_styles",
+                        lambda attribute, values, min_wins: styled_rows.append(len(values)) or compute_value_styles(attribute, values, min_wins))
+
+    unfold_all(report)
+    styles = report.style_table(report.get_view_table())
+    computed = sum(styled_rows)
+    assert computed > 0
+    # expansions grow with the problem, the best value is green and the worst blue
+    first_problem = styles.loc[("expansions", "domain0", "p0.pddl")]
+    assert first_problem["alg1"] == "color: #00af00;" and first_problem["alg2"] == "color: #0000ff;"
+
+    report.unfolded = dict()
+    report.style_table(report.get_view_table())
+    unfold_all(report)
+    report.style_table(report.get_view_table())
+    assert sum(styled_rows) == computed
+
+    # Aggregating again only restyles the aggregate rows.
+    report.experiment_data.set_attribute_customizations(dict(), { "expansions" : "mean" })
+    report.aggregate_where_necessary()
+    styled_rows.clear()
+    report.style_table(report.get_view_table())
+    assert sum(styled_rows) == 1 + len(report.domains)
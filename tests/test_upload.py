@@ -0,0 +1,125 @@
+import asyncio
+import http.client
+import json
+import os
+import threading
+
+import pytest
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.web import Application
+
+import upload
+
+
+@pytest.fixture
+def session_upload(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload, "UPLOAD_DIR", str(tmp_path))
+    session_upload = upload.create_upload(object())
+    yield session_upload
+    upload.discard_upload(session_upload)
+
+
+def append(session_upload, offset, size, data):
+    chunk = session_upload.start_chunk(offset, size, len(data))
+    if chunk is not None:
+        session_upload.write(chunk, data)
+        session_upload.end_chunk(chunk)
+    return session_upload.received
+
+
+def test_upload_in_chunks(session_upload):
+    assert append(session_upload, 0, 6, b"abc") == 3
+    # A repeated chunk is not appended again.
+    assert append(session_upload, 0, 6, b"abc") == 3
+    assert session_upload.complete() is None
+    assert append(session_upload, 3, 6, b"def") == 6
+    uploaded_file = session_upload.complete()
+    with open(uploaded_file, "rb") as f:
+        assert f.read() == b"abcdef"
+
+
+def test_size_mismatch(session_upload):
+    append(session_upload, 0, 6, b"abc")
+    with pytest.raises(ValueError, match="Size mismatch: expected 6 bytes, got 7."):
+        append(session_upload, 3, 7, b"defg")
+
+
+def test_size_limit(session_upload, monkeypatch):
+    monkeypatch.setattr(upload, "MAX_UPLOAD_SIZE", 4)
+    with pytest.raises(ValueError, match="exceeds MAX_UPLOAD_SIZE"):
+        append(session_upload, 0, 6, b"abc")
+    assert session_upload.size is None
+
+
+def test_chunk_beyond_size(session_upload):
+    with pytest.raises(ValueError, match="exceeds the upload size of 2 bytes"):
+        append(session_upload, 0, 2, b"abc")
+
+
+def test_one_chunk_at_a_time(session_upload):
+    chunk = session_upload.start_chunk(0, 6, 3)
+    assert session_upload.start_chunk(0, 6, 3) is None
+    session_upload.write(chunk, b"abc")
+    session_upload.end_chunk(chunk)
+    # Writes of a chunk that already ended are dropped.
+    session_upload.write(chunk, b"xyz")
+    assert session_upload.received == 3
+
+
+def test_removed_upload_is_not_written(session_upload):
+    chunk = session_upload.start_chunk(0, 6, 3)
+    upload.discard_upload(session_upload)
+    session_upload.write(chunk, b"abc")
+    assert not os.path.exists(session_upload.path)
+    assert session_upload.id not in upload.uploads
+
+
+def test_one_active_upload_per_session(session_upload):
+    with pytest.raises(ValueError, match="already has an active upload"):
+        upload.create_upload(session_upload.owner)
+    append(session_upload, 0, 3, b"abc")
+    other = upload.create_upload(session_upload.owner)
+    upload.discard_upload(other)
+
+
+@pytest.fixture
+def upload_server():
+    loop = asyncio.new_event_loop()
+    sock, port = bind_unused_port()
+    started = threading.Event()
+    def serve():
+        asyncio.set_event_loop(loop)
+        HTTPServer(Application(upload.upload_routes())).add_sockets([sock])
+        started.set()
+        loop.run_forever()
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    started.wait()
+    yield port
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+
+def put(port, session_upload, offset, size, body):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    try:
+        connection.request("PUT", f"{upload.UPLOAD_ROUTE}/{session_upload.id}?offset={offset}&size={size}", body)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())["received"]
+    finally:
+        connection.close()
+
+
+def test_upload_endpoint(session_upload, upload_server):
+    assert put(upload_server, session_upload, 0, 6, b"abc") == (200, 3)
+    assert put(upload_server, session_upload, 0, 6, b"abc") == (409, 3)
+    assert put(upload_server, session_upload, 3, 6, b"def") == (200, 6)
+    with open(session_upload.complete(), "rb") as f:
+        assert f.read() == b"abcdef"
+
+
+def test_endpoint_rejects_large_chunks(session_upload, upload_server, monkeypatch):
+    monkeypatch.setattr(upload, "UPLOAD_CHUNK_SIZE", 4)
+    assert put(upload_server, session_upload, 0, 6, b"abcdef") == (400, 0)
+    assert session_upload.size is None or session_upload.received == 0
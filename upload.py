@@ -0,0 +1,255 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import uuid
+
+import param
+from panel.reactive import ReactiveHTML
+from tornado.ioloop import IOLoop
+from tornado.web import RequestHandler, stream_request_body
+
+# Route of the upload endpoint, chunks of upload <id> are sent to <route>/<id>.
+UPLOAD_ROUTE = "/upload"
+# Size of the chunks the browser sends, well below tornado's default max_body_size.
+UPLOAD_CHUNK_SIZE = 8 * 2**20
+UPLOAD_DIR = os.environ.get("VISUALIZER_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "visualizer-uploads"))
+MAX_UPLOAD_SIZE = int(os.environ.get("VISUALIZER_MAX_UPLOAD_MB", 2048)) * 2**20
+
+logger = logging.getLogger("visualizer")
+# Whether the upload endpoint is registered, which panel serve cannot do (see serve.py).
+enabled = False
+lock = threading.Lock()
+uploads = dict() # id -> Upload, only ids handed out to sessions are accepted
+
+
+# Path of a completely uploaded properties file. It is a path for loading,
+# while the registry and the cache identify it by its content.
+class UploadedFile(str):
+    def __new__(cls, path, digest):
+        uploaded_file = super().__new__(cls, path)
+        uploaded_file.digest = digest
+        return uploaded_file
+
+
+# A file that is uploaded in chunks into UPLOAD_DIR for the session owner.
+# Chunks have to arrive in order and one at a time, the client resumes an
+# interrupted upload at the number of received bytes.
+class Upload():
+    def __init__(self, owner):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.path = os.path.join(UPLOAD_DIR, self.id)
+        self.lock = threading.Lock()
+        self.hash = hashlib.sha256()
+        self.received = 0
+        self.size = None
+        self.chunk = None # number of the chunk that is being written
+        self.chunks = 0
+        self.removed = False
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        open(self.path, "wb").close()
+
+    # Whether the upload has not received the whole file yet.
+    def active(self):
+        with self.lock:
+            return self.size is None or self.received != self.size
+
+    # Starts writing a chunk of length bytes at offset of a file of size
+    # bytes and returns its number. Returns None if the upload does not
+    # continue at offset or another chunk is being written.
+    def start_chunk(self, offset, size, length):
+        with self.lock:
+            if size > MAX_UPLOAD_SIZE:
+                raise ValueError(f"Upload of {size} bytes exceeds MAX_UPLOAD_SIZE ({MAX_UPLOAD_SIZE} bytes).")
+            if self.size is None:
+                self.size = size
+            if size != self.size:
+                raise ValueError(f"Size mismatch: expected {self.size} bytes, got {size}.")
+            if offset + length > size:
+                raise ValueError(f"Chunk at offset {offset} exceeds the upload size of {size} bytes.")
+            if self.chunk is not None or self.removed or offset != self.received:
+                return None
+            self.chunks += 1
+            self.chunk = self.chunks
+            return self.chunk
+
+    # Appends data of the given chunk as it arrives. Nothing is written once
+    # the chunk ended (writes may still be pending when its connection
+    # closes) or the upload is removed, e.g. because its session was destroyed.
+    def write(self, chunk, data):
+        with self.lock:
+            if chunk != self.chunk or self.removed:
+                return
+            with open(self.path, "ab") as f:
+                f.write(data)
+            self.hash.update(data)
+            self.received += len(data)
+
+    def end_chunk(self, chunk):
+        with self.lock:
+            if chunk == self.chunk:
+                self.chunk = None
+
+    def complete(self):
+        with self.lock:
+            if self.size is None or self.received != self.size:
+                return None
+            return UploadedFile(self.path, self.hash.hexdigest())
+
+    def remove(self):
+        with self.lock:
+            self.removed = True
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+# Returns a new upload for the session owner. Raises ValueError if the
+# session still has an upload that did not receive its whole file, such
+# that every session writes at most one file at a time.
+def create_upload(owner):
+    with lock:
+        if any(u.owner is owner and u.active() for u in uploads.values()):
+            raise ValueError("The session already has an active upload.")
+        upload = Upload(owner)
+        uploads[upload.id] = upload
+    return upload
+
+
+def discard_upload(upload):
+    with lock:
+        uploads.pop(upload.id, None)
+    upload.remove()
+
+
+# Receives the chunks of an upload: PUT <route>/<id>?offset=<o>&size=<s>
+# appends the request body at offset o of a file of s bytes, GET <route>/<id>
+# returns the number of received bytes to resume an interrupted upload.
+# The body is streamed into the file in a worker thread, so large uploads
+# don't block the event loop of the other sessions. Chunks that are too
+# large or do not continue the upload are rejected before their body is
+# read, with 409 if the client should resume at the returned offset.
+@stream_request_body
+class UploadHandler(RequestHandler):
+    def upload(self, upload_id):
+        with lock:
+            upload = uploads.get(upload_id)
+        if upload is None:
+            self.send_error(404)
+        return upload
+
+    def reply(self, received, status=200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps({"received": received}))
+
+    def prepare(self):
+        self.chunk_upload = None
+        if self.request.method != "PUT":
+            return
+        upload = self.upload(*self.path_args)
+        if not upload:
+            return
+        try:
+            offset = int(self.get_argument("offset"))
+            size = int(self.get_argument("size"))
+            length = int(self.request.headers.get("Content-Length", -1))
+            if not 0 <= length <= UPLOAD_CHUNK_SIZE:
+                raise ValueError(f"Chunks need a Content-Length of at most UPLOAD_CHUNK_SIZE ({UPLOAD_CHUNK_SIZE} bytes).")
+            chunk = upload.start_chunk(offset, size, length)
+        except ValueError as ex:
+            logger.warning(f"Rejected upload chunk: {ex}")
+            self.reply(upload.received, 400)
+            return
+        if chunk is None:
+            self.reply(upload.received, 409)
+            return
+        self.chunk_upload = (upload, chunk)
+        self.request.connection.set_max_body_size(UPLOAD_CHUNK_SIZE)
+
+    async def data_received(self, data):
+        if self.chunk_upload:
+            await IOLoop.current().run_in_executor(None, self.chunk_upload[0].write, self.chunk_upload[1], data)
+
+    def get(self, upload_id):
+        upload = self.upload(upload_id)
+        if upload:
+            self.reply(upload.received)
+
+    def put(self, upload_id):
+        self.reply(self.chunk_upload[0].received)
+
+    def on_finish(self):
+        if self.chunk_upload:
+            self.chunk_upload[0].end_chunk(self.chunk_upload[1])
+            self.chunk_upload = None
+
+    # A chunk whose connection closed is over, the client resumes at the received bytes.
+    def on_connection_close(self):
+        self.on_finish()
+
+
+# Tornado routes of the upload endpoint, for the extra_patterns of the server.
+def upload_routes():
+    return [(UPLOAD_ROUTE + r"/([0-9a-f]{32})", UploadHandler)]
+
+
+# File input sending the selected file in chunks to the upload endpoint
+# instead of in one websocket message. completed is incremented once the
+# whole file was received under upload_id.
+class ChunkedFileInput(ReactiveHTML):
+    upload_id = param.String()
+    route = param.String(default=UPLOAD_ROUTE)
+    chunk_size = param.Integer(default=UPLOAD_CHUNK_SIZE)
+    filename = param.String()
+    size = param.Integer(default=0)
+    uploaded = param.Integer(default=0)
+    error = param.String()
+    completed = param.Integer(default=0)
+
+    _template = '<input type="file" id="input" onchange="${script(\'upload\')}"></input>'
+
+    _scripts = {
+        "upload": """
+        const file = input.files[0]
+        if (!file)
+          return
+        const url = `${data.route}/${data.upload_id}`
+        data.filename = file.name
+        data.size = file.size
+        data.uploaded = 0
+        data.error = ""
+        const send = async () => {
+          let offset = 0
+          let failures = 0
+          while (offset < file.size) {
+            try {
+              const end = Math.min(offset + data.chunk_size, file.size)
+              const response = await fetch(`${url}?offset=${offset}&size=${file.size}`,
+                                           {method: "PUT", body: file.slice(offset, end)})
+              if (!response.ok && response.status != 409)
+                throw new Error(`upload failed with status ${response.status}`)
+              offset = (await response.json()).received
+              failures = 0
+            } catch (error) {
+              if (++failures > 5) {
+                data.error = String(error)
+                return
+              }
+              // Resume at what the server received before the failure.
+              await new Promise(resolve => setTimeout(resolve, 1000 * failures))
+              try {
+                offset = (await (await fetch(url)).json()).received
+              } catch (error) {}
+            }
+            data.uploaded = offset
+          }
+          data.completed = data.completed + 1
+        }
+        send()
+        """,
+    }
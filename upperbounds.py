@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Bounds from planning.domains, shipped with the visualizer.
+UPPER_BOUNDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "upper_bounds.json")
+# Name of the bounds file that is used for the properties files in the same directory.
+SUITE_UPPER_BOUNDS_FILE = "upper_bounds.json"
+
+logger = logging.getLogger("visualizer")
+lock = threading.Lock()
+loaded = dict() # paths -> ((path, mtime, size) of every file, UpperBounds), files are only parsed once per process and content
+
+
+# Upper bounds on the plan costs of (domain, problem) pairs. Bounds are
+# sorted by their (domain, problem) codes, such that the bounds of all rows
+# of a properties file are looked up on integer codes at once.
+class UpperBounds():
+    def __init__(self, bounds):
+        self.levels = None
+        self.codes = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0)
+        if bounds:
+            index = pd.MultiIndex.from_tuples(list(bounds.keys()), names=["domain", "problem"])
+            codes = index.codes[0].astype(np.int64) * len(index.levels[1]) + index.codes[1]
+            order = np.argsort(codes)
+            self.levels = index.levels
+            self.codes = codes[order]
+            self.values = np.array(list(bounds.values()), dtype=float)[order]
+
+    # Returns the bound of every (domain, problem) of row_index, NaN if unknown.
+    # Only the levels of row_index are matched by name, the rows by their codes.
+    def lookup(self, row_index):
+        if self.levels is None:
+            return np.full(len(row_index), np.nan)
+        domains = self.levels[0].get_indexer(row_index.levels[0])[row_index.codes[0]]
+        problems = self.levels[1].get_indexer(row_index.levels[1])[row_index.codes[1]]
+        codes = domains.astype(np.int64) * len(self.levels[1]) + problems
+        positions = np.minimum(np.searchsorted(self.codes, codes), len(self.codes) - 1)
+        found = (domains >= 0) & (problems >= 0) & (self.codes[positions] == codes)
+        return np.where(found, self.values[positions], np.nan)
+
+
+# Returns the bounds files used for a properties source: the shipped file,
+# the files listed in VISUALIZER_UPPER_BOUNDS (separated by os.pathsep) and
+# an upper_bounds.json next to a local properties file. Later files override
+# the bounds of earlier ones.
+def upper_bounds_files(source):
+    files = [UPPER_BOUNDS_FILE]
+    files += [f for f in os.environ.get("VISUALIZER_UPPER_BOUNDS", "").split(os.pathsep) if f]
+    if isinstance(source, str) and source and not re.match(r"^[a-zA-Z][a-zA-Z0-9+.-]*://", source):
+        suite_file = os.path.join(os.path.dirname(os.path.abspath(source)), SUITE_UPPER_BOUNDS_FILE)
+        if os.path.exists(suite_file):
+            files.append(suite_file)
+    return list(dict.fromkeys(os.path.abspath(f) for f in files))
+
+
+# Returns (path, mtime, size) of all existing files, which changes whenever
+# the bounds change.
+def file_states(files):
+    states = []
+    for path in files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            logger.warning(f"Could not find upper bounds file {path}.")
+            continue
+        states.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(states)
+
+
+# Returns a string identifying the content of the given bounds files.
+def upper_bounds_identity(files):
+    return "\0".join(f"{path}:{mtime}:{size}" for path, mtime, size in file_states(files))
+
+
+def read_bounds_file(path):
+    with open(path) as f:
+        entries = json.load(f)
+    return { (e["domain"], e["problem"]) : e["upper_bound"] for e in entries.values()
+             if e.get("upper_bound") is not None }
+
+
+# Returns the merged bounds of the given files, parsing them at most once
+# per process and content.
+def load_upper_bounds(files):
+    key = tuple(files)
+    states = file_states(files)
+    with lock:
+        if key in loaded and loaded[key][0] == states:
+            return loaded[key][1]
+    bounds = dict()
+    for path, _, _ in states:
+        try:
+            bounds.update(read_bounds_file(path))
+        except Exception:
+            logger.exception(f"Could not read upper bounds file {path}.")
+    upper_bounds = UpperBounds(bounds)
+    with lock:
+        loaded[key] = (states, upper_bounds)
+    return upper_bounds
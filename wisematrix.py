@@ -0,0 +1,130 @@
+from collections import OrderedDict
+import logging
+import threading
+
+import numpy as np
+
+# Upper bound on the number of (task, algorithm, algorithm) comparisons that
+# are held in memory at once, larger comparisons are done in chunks.
+WISE_CHUNK_ELEMENTS = 1 << 24
+# Default upper bound on the bytes held by one WiseMatrixCache.
+WISE_CACHE_SIZE = 256 * 2**20
+
+
+# Returns +1/-1/0 per task and pair (row algorithm, column algorithm) if the
+# row algorithm is better/worse/equal.
+def pairwise_wins(values, rows, min_wins):
+    row_values = values[:, rows, np.newaxis]
+    col_values = values[:, np.newaxis, :]
+    better, worse = (row_values < col_values, row_values > col_values) if min_wins else (row_values > col_values, row_values < col_values)
+    return better.astype(np.int8) - worse.astype(np.int8)
+
+
+# Returns (algorithms x algorithms) matrices with the number of tasks and
+# domains on which the row algorithm is better than the column algorithm. A
+# domain counts if the row algorithm is better on more tasks than the column
+# algorithm. values is a (tasks x algorithms) array sorted by domain, with
+# the domains starting at domain_offsets. Missing values are worse than any
+# value, tasks where both are missing count for neither.
+# If signs is set, the per-task comparisons are returned as well, as two
+# (tasks x algorithms x packed algorithms) bit arrays for better and worse.
+def win_counts(values, domain_offsets, min_wins, signs=False):
+    values = np.where(np.isnan(values), np.inf if min_wins else -np.inf, values)
+    num_tasks, num_algorithms = values.shape
+    task_wins = np.zeros((num_algorithms, num_algorithms), dtype=np.int64)
+    domain_wins = np.zeros((num_algorithms, num_algorithms), dtype=np.int64)
+    packed_shape = (num_tasks, num_algorithms, (num_algorithms + 7) // 8)
+    better = np.zeros(packed_shape, dtype=np.uint8) if signs else None
+    worse = np.zeros(packed_shape, dtype=np.uint8) if signs else None
+    if num_tasks == 0:
+        return task_wins, domain_wins, better, worse
+
+    # Split the tasks into chunks of whole domains and the row algorithms
+    # into chunks such that one chunk has at most WISE_CHUNK_ELEMENTS
+    # comparisons (unless a single domain and row is larger than that).
+    offsets = np.append(domain_offsets, num_tasks)
+    max_tasks = max(1, WISE_CHUNK_ELEMENTS // (num_algorithms * num_algorithms))
+    bounds = [0]
+    for d in range(1, len(offsets) - 1):
+        if offsets[d+1] - offsets[bounds[-1]] > max_tasks:
+            bounds.append(d)
+    bounds.append(len(offsets) - 1)
+
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        tasks = slice(offsets[first], offsets[last])
+        chunk_offsets = offsets[first:last] - offsets[first]
+        chunk_size = max(1, WISE_CHUNK_ELEMENTS // ((tasks.stop - tasks.start) * num_algorithms))
+        for start in range(0, num_algorithms, chunk_size):
+            rows = np.arange(start, min(start + chunk_size, num_algorithms))
+            wins = pairwise_wins(values[tasks], rows, min_wins)
+            task_wins[rows] += (wins > 0).sum(axis=0)
+            domain_wins[rows] += (np.add.reduceat(wins, chunk_offsets, axis=0, dtype=np.int64) > 0).sum(axis=0)
+            if signs:
+                better[tasks, rows] = np.packbits(wins > 0, axis=2)
+                worse[tasks, rows] = np.packbits(wins < 0, axis=2)
+    return task_wins, domain_wins, better, worse
+
+
+class WiseMatrices():
+    def __init__(self, task_wins, domain_wins, better, worse):
+        self.task_wins = task_wins
+        self.domain_wins = domain_wins
+        self.better = better # packed bits per (task, row algorithm, column algorithm), or None
+        self.worse = worse
+        self.nbytes = sum(x.nbytes for x in [task_wins, domain_wins, better, worse] if x is not None)
+
+    # Returns +1/-1/0 per task if algorithm row is better/worse/equal than
+    # algorithm col, or None if the signs are not kept.
+    def pair_signs(self, row, col):
+        if self.better is None:
+            return None
+        byte, bit = divmod(col, 8)
+        mask = np.uint8(0x80 >> bit)
+        better = (self.better[:, row, byte] & mask) != 0
+        worse = (self.worse[:, row, byte] & mask) != 0
+        return better.astype(np.int8) - worse.astype(np.int8)
+
+
+# Cache of the wise matrices of one AttributeStore, keyed by attribute and
+# min_wins. The least recently used entries are evicted once the cache holds
+# more than max_size bytes. Per-task signs are only kept if they fit into a
+# quarter of the cache.
+class WiseMatrixCache():
+    def __init__(self, store, max_size=WISE_CACHE_SIZE):
+        self.logger = logging.getLogger("visualizer")
+        self.store = store
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+
+
+    def get(self, attribute, min_wins):
+        key = (attribute, bool(min_wins))
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+
+        values = self.store.columns[attribute]
+        num_tasks, num_algorithms = values.shape
+        signs = 2 * num_tasks * num_algorithms * ((num_algorithms + 7) // 8) <= self.max_size // 4
+        matrices = WiseMatrices(*win_counts(values, self.store.domain_offsets, min_wins, signs))
+
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = matrices
+                self.size += matrices.nbytes
+            while self.size > self.max_size and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted.nbytes
+            return self.entries.get(key, matrices)
+
+
+    # Computes the matrices of all given (attribute, min_wins) pairs that are not cached yet.
+    def warm(self, keys):
+        try:
+            for attribute, min_wins in keys:
+                self.get(attribute, min_wins)
+        except Exception:
+            self.logger.exception("Could not precompute the wise matrices.")
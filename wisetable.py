@@ -17,13 +17,11 @@ class WiseTablereport(Report):
 
         self.domain_wise_table = pd.DataFrame()
         self.task_wise_table = pd.DataFrame()
-        self.per_task_table = pd.DataFrame()
-        self.per_domain_table = pd.DataFrame()
         self.domain_wise = pn.widgets.Tabulator(pd.DataFrame(), disabled = True, sortable=False, pagination="remote", page_size=1000)
-        self.domain_wise.style.apply(func=partial(self.style_wise_by_row, table_type="domain"), axis=1)
+        self.domain_wise.style.apply(func=self.style_wise, axis=None)
         self.domain_wise.on_click(self.on_domain_wise_click_callback)
         self.task_wise = pn.widgets.Tabulator(pd.DataFrame(), disabled = True, sortable=False, pagination="remote", page_size=1000)
-        self.task_wise.style.apply(func=partial(self.style_wise_by_row, table_type="task"), axis=1)
+        self.task_wise.style.apply(func=self.style_wise, axis=None)
         self.task_wise.on_click(self.on_task_wise_click_callback)
 
         self.data_view = pn.Column(
@@ -57,59 +55,90 @@ class WiseTablereport(Report):
         param_updates = super().set_experiment_data_dependent_parameters()
         self.param.attribute.objects = ["--"] + self.experiment_data.numeric_attributes
         param_updates["attribute"] = self.param.attribute.objects[0]
-        d = { a1 : {a2 : 0 for a2 in self.experiment_data.algorithms} for a1 in self.experiment_data.algorithms }
-        self.task_wise_table = pd.DataFrame(d)
-        self.domain_wise_table = pd.DataFrame(d)
+        self.task_wise_table = pd.DataFrame()
+        self.domain_wise_table = pd.DataFrame()
 
         return param_updates
 
 
-    def style_wise_by_row(self, row, table_type):
-        style = [""] * len(row)
-        row_alg = row.name
-        df = self.task_wise_table if table_type == "task" else self.domain_wise_table
+    # Bold where the row algorithm wins more often than the column algorithm.
+    def style_wise(self, df):
+        values = df.to_numpy()
+        styles = np.full(values.shape, "", dtype=object)
+        styles[np.eye(*values.shape, dtype=bool)] = "color:gray;"
+        styles[values.T < values] = "font-weight:bold;"
+        return pd.DataFrame(styles, index=df.index, columns=df.columns)
+
+
+    # Returns the (tasks x algorithms) values of self.attribute with missing
+    # values replaced by the worst possible value.
+    def get_task_values(self, algorithms):
+        min_wins = self.experiment_data.attribute_info[self.attribute].min_wins
+        values = self.experiment_data.views.numeric_block(self.attribute, algorithms)
+        return np.where(np.isnan(values), np.inf if min_wins else -np.inf, values)
 
-        for i, (alg, val) in enumerate(row.items()):
-            if df.at[alg, row_alg] < val:
-                style[i] = style[i] + "font-weight:bold;"
-            elif row.name == alg:
-                style[i] = style[i] + "color:gray;"
-        return style
 
+    # Returns the (possibly cached) wise matrices of self.attribute.
+    def get_matrices(self):
+        min_wins = self.experiment_data.attribute_info[self.attribute].min_wins
+        return self.experiment_data.wise_cache.get(self.attribute, min_wins)
+
+
+    # Returns per task: +1/-1/0 if row_alg is better/worse/equal than col_alg,
+    # NaN if neither has a value.
+    def get_task_wins(self, row_alg, col_alg):
+        min_wins = self.experiment_data.attribute_info[self.attribute].min_wins
+        values = self.get_task_values([row_alg, col_alg])
+        with np.errstate(invalid="ignore"):
+            diff = values[:, 0] - values[:, 1]
+        return diff, np.sign(diff) * (-1 if min_wins else 1)
 
+
+    # The comparison tables behind a cell are only computed when it is clicked.
     def on_domain_wise_click_callback(self, e):
         self.domain_wise.selection = []
-        row_alg = self.domain_wise_table.iloc[e.row].name
         col_alg = e.column
         if col_alg not in self.domain_wise_table.columns:
             return
-        comparison = pn.widgets.Tabulator(
-            self.per_domain_table[[(row_alg, col_alg, "win")]].copy(),
-            disabled = True, pagination="remote", page_size=100)
-        self.add_popup(comparison, name=f"Domain comparison {row_alg} vs {col_alg}")
+        algorithms = self.experiment_data.algorithms
+        row_alg = algorithms[e.row]
+        wins = self.get_matrices().pair_signs(e.row, algorithms.index(col_alg))
+        if wins is None:
+            _, wins = self.get_task_wins(row_alg, col_alg)
+        store = self.experiment_data.data
+        domain_wins = np.add.reduceat(np.nan_to_num(wins).astype(float), store.domain_offsets) if len(wins) else wins
+        row_name, col_name = self.display_names[row_alg], self.display_names[col_alg]
+        per_domain_table = pd.DataFrame({(row_name, col_name, "win") : domain_wins},
+                                        index=pd.Index(store.block_domains, name="domain"))
+        comparison = pn.widgets.Tabulator(per_domain_table, disabled = True, pagination="remote", page_size=100)
+        self.add_popup(comparison, name=f"Domain comparison {row_name} vs {col_name}")
 
 
     def on_task_wise_click_callback(self, e):
         self.task_wise.selection = []
-        row_alg = self.task_wise_table.iloc[e.row].name
         col_alg = e.column
         if col_alg not in self.task_wise_table.columns:
             return
-        comparison = pn.widgets.Tabulator(
-            self.per_task_table[list({row_alg, col_alg, (row_alg, col_alg)})].copy(),
-            disabled = True, pagination="remote", page_size=100)
-        comparison.on_click(partial(self.on_comparison_click_callback, df=comparison.value))
-        self.add_popup(comparison, name=f"Task comparison {row_alg} vs {col_alg}")
-
-
-    def on_comparison_click_callback(self, e, df):
+        row_alg = self.experiment_data.algorithms[e.row]
+        values = self.get_task_values([row_alg, col_alg])
+        diff, _ = self.get_task_wins(row_alg, col_alg)
+        row_name, col_name = self.display_names[row_alg], self.display_names[col_alg]
+        per_task_table = pd.DataFrame({row_name : values[:, 0], col_name : values[:, 1], (row_name, col_name) : diff},
+                                      index=self.experiment_data.data.problem_index)
+        comparison = pn.widgets.Tabulator(per_task_table, disabled = True, pagination="remote", page_size=100)
+        comparison.on_click(partial(self.on_comparison_click_callback, df=comparison.value,
+                                    algorithms=list(dict.fromkeys([row_alg, col_alg]))))
+        self.add_popup(comparison, name=f"Task comparison {row_name} vs {col_name}")
+
+
+    def on_comparison_click_callback(self, e, df, algorithms):
         row = df.iloc[e.row]
         dom = row.name[0]
         prob = row.name[1]
         param_dict = {
           "domain": dom,
           "problem": prob,
-          "algorithms": list(set(row.keys()).intersection(set(self.experiment_data.algorithms)))
+          "algorithms": algorithms
         }
         problem_report = ProblemTablereport(self.experiment_data, param_dict,
             sizing_mode = "stretch_width")
@@ -121,26 +150,18 @@ class WiseTablereport(Report):
             self.data_view.value = pd.DataFrame()
             return
 
-        min_wins = self.experiment_data.attribute_info[self.attribute].min_wins
-
-        self.per_task_table = self.experiment_data.data.loc[self.attribute].copy()
-        self.per_task_table.replace([np.NaN, None], np.inf if min_wins else -np.inf, inplace=True)
-
-        for a1 in self.experiment_data.algorithms:
-            l = []
-            for a2 in self.experiment_data.algorithms:
-                self.per_task_table[(a1,a2)] = self.per_task_table[a1]-self.per_task_table[a2]
-                self.per_task_table[(a1,a2,"win")] = np.sign(self.per_task_table[(a1,a2)])
-                if min_wins:
-                  self.per_task_table[(a1,a2,"win")] *= -1
-                num_better = len(self.per_task_table[(self.per_task_table[(a1,a2,"win")] > 0)].index)
-                self.task_wise_table.at[a1,a2] = num_better
-
-                self.per_domain_table[(a1,a2,"win")] = self.per_task_table[(a1,a2,"win")].groupby(["domain"]).sum()
-                self.domain_wise_table.at[a1,a2] = len(self.per_domain_table[self.per_domain_table[(a1,a2,"win")] > 0].index)
-
-        self.task_wise.value = self.task_wise_table[self.experiment_data.algorithms]
-        self.domain_wise.value = self.domain_wise_table[self.experiment_data.algorithms]
+        # Rows show the display names, columns keep the algorithms and get the display names as titles.
+        algorithms = self.experiment_data.algorithms
+        names = [self.display_names[a] for a in algorithms]
+        matrices = self.get_matrices()
+        self.task_wise_table = pd.DataFrame(matrices.task_wins, index=names, columns=algorithms)
+        self.domain_wise_table = pd.DataFrame(matrices.domain_wins, index=names, columns=algorithms)
+        titles = { a : name for a, name in zip(algorithms, names) if a != name }
+        self.task_wise.titles = titles
+        self.domain_wise.titles = titles
+
+        self.task_wise.value = self.task_wise_table
+        self.domain_wise.value = self.domain_wise_table
 
     def get_params_as_dict(self):
         return super().get_params_as_dict()